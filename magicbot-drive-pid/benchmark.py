@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Benchmarks `DriveControl.turn_to_angle` against the physics model in
+`physics.py`, as fast as the simulation can run. Each case starts the robot
+at rest at a gyro angle of 0 and holds a setpoint for a fixed time, and its
+settling time, overshoot, steady-state error and the CPU time of each loop
+are reported, so changes to the gains or the controller can be compared.
+Both the PID controller and Motion Magic turns are run unless one is chosen.
+
+Motion Magic turns are only an emulator comparison: the motors' profiles
+are run by `physics.MotionMagicSim`, not by the phoenix6 simulation, so
+they show how the emulated loop settles rather than how a TalonFX would.
+
+Usage: python benchmark.py [--set NAME=VALUE ...] [--duration SECONDS]
+                           [--controller pid|emulated_motion_magic]
+"""
+
+import argparse
+import math
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+import wpilib
+from magicbot.magic_tunable import setup_tunables
+from wpilib.simulation import DriverStationSim
+
+from components.drive_control import DriveControl
+from components.drivetrain import Drivetrain
+from config import ControllerType
+from physics import PhysicsEngine
+import robot
+import util
+
+
+controllers = ("pid", "emulated_motion_magic")
+
+# setpoints in degrees; 270 and 350 are reached by turning back across 0
+setpoints = (90, 180, 270, 350)
+
+"""`settling_time` is how long it took for the error to stay within the
+tolerance (None if it never did), `overshoot` is how far in degrees the robot
+turned past the setpoint, `steady_state_error` is the mean absolute error in
+degrees over the last `steady_state_window` seconds and `cpu_time` is the mean
+time in seconds taken by the components' `execute()` each loop.
+"""
+TurnResult = namedtuple(
+    "TurnResult",
+    "setpoint settling_time overshoot steady_state_error cpu_time",
+)
+
+
+class TurnBenchmark:
+    """Holds the components under test along with the simulated motors, gyro
+    and drivetrain physics, which persist between cases
+    """
+
+    period = 0.02
+    tolerance = 2.0
+    steady_state_window = 0.5
+
+    def __init__(self, tunables: dict = None, motion_magic: bool = False):
+        """Arguments:
+        tunables -- values for `DriveControl`'s and `Drivetrain`'s tunables,
+                    by attribute name
+        motion_magic -- turn with Motion Magic (as emulated by the physics)
+                        instead of the PID controller
+        """
+        cfg = robot.drivetrain_cfg
+        if cfg.controller_type != ControllerType.TALON_FX:
+            raise Exception("the benchmark only simulates TalonFX drivetrains")
+        self.robot = SimpleNamespace(
+            drivetrain_controller_type=cfg.controller_type,
+            drivetrain_front_left_motor=util.WPI_TalonFX(
+                cfg.front_left_id, dedupe=True
+            ),
+            drivetrain_front_right_motor=util.WPI_TalonFX(
+                cfg.front_right_id, dedupe=True
+            ),
+            drivetrain_back_left_motor=util.WPI_TalonFX(cfg.back_left_id, dedupe=True),
+            drivetrain_back_right_motor=util.WPI_TalonFX(
+                cfg.back_right_id, dedupe=True
+            ),
+        )
+        # created before the physics, as the robot's are
+        self.navx = util.create_navx()
+
+        self.drivetrain = Drivetrain()
+        self.drivetrain.controller_type = cfg.controller_type
+        self.drivetrain.position_control = motion_magic
+        self.drivetrain.front_left_motor = self.robot.drivetrain_front_left_motor
+        self.drivetrain.front_right_motor = self.robot.drivetrain_front_right_motor
+        self.drivetrain.back_left_motor = self.robot.drivetrain_back_left_motor
+        self.drivetrain.back_right_motor = self.robot.drivetrain_back_right_motor
+        self.drivetrain.meters_per_rotation = (
+            math.pi * cfg.wheel_diameter / cfg.gear_ratio
+        )
+        setup_tunables(self.drivetrain, "drivetrain")
+        # read from the physics, see `physics.MotionMagicSim`
+        self.drivetrain.get_wheel_positions = lambda: (
+            self.physics.drivetrain.getLeftPosition(),
+            self.physics.drivetrain.getRightPosition(),
+        )
+
+        self.drive_control = DriveControl()
+        self.drive_control.drivetrain = self.drivetrain
+        self.drive_control.navx = self.navx
+        self.drive_control.track_width = cfg.track_width
+        self.drive_control.motion_magic = motion_magic
+        setup_tunables(self.drive_control, "drive_control")
+
+        for name, value in (tunables or {}).items():
+            if hasattr(DriveControl, name):
+                setattr(self.drive_control, name, value)
+            else:
+                setattr(self.drivetrain, name, value)
+        self.drivetrain.setup()
+        self.drive_control.setup()
+
+    def close(self):
+        self.drive_control.turn_to_angle_tunables.close()
+        if self.drivetrain.position_control:
+            self.drivetrain.motion_magic_tunables.close()
+
+    def run(self, setpoint: float, duration: float = 3.0) -> TurnResult:
+        """Turns from rest at a gyro angle of 0 to `setpoint` for `duration`
+        seconds of simulated time and returns the results
+        """
+        DriverStationSim.setEnabled(True)
+        DriverStationSim.notifyNewData()
+        self.physics = PhysicsEngine(
+            SimpleNamespace(field=wpilib.Field2d()), self.robot
+        )
+        self.navx.reset()
+        self.drive_control.turn_to_angle_controller.reset()
+
+        loops = round(duration / self.period)
+        steady_state_loops = round(self.steady_state_window / self.period)
+        direction = math.copysign(1, math.remainder(setpoint, 360))
+        settling_time = 0.0
+        overshoot = 0.0
+        steady_state_error = 0.0
+        cpu_time = 0.0
+        for i in range(loops):
+            start = time.perf_counter()
+            # what magicbot's reset of `will_reset_to` variables would do
+            self.drivetrain.wheel_targets = None
+            self.drive_control.turn_to_angle(setpoint)
+            self.drive_control.execute()
+            self.drivetrain.execute()
+            cpu_time += time.perf_counter() - start
+            self.physics.update_sim(i * self.period, self.period)
+
+            error = math.remainder(setpoint - self.navx.getAngle(), 360)
+            if abs(error) > self.tolerance:
+                settling_time = (i + 1) * self.period
+            overshoot = max(overshoot, -error * direction)
+            if i >= loops - steady_state_loops:
+                steady_state_error += abs(error)
+
+        # leave the robot stopped for the next case
+        self.drive_control.done()
+        self.drivetrain.drive.stopMotor()
+        return TurnResult(
+            setpoint,
+            None if settling_time >= loops * self.period else settling_time,
+            overshoot,
+            steady_state_error / steady_state_loops,
+            cpu_time / loops,
+        )
+
+
+def run_benchmark(
+    tunables: dict = None, duration: float = 3.0, motion_magic: bool = False
+) -> list[TurnResult]:
+    """Runs every case in `setpoints` and returns their results"""
+    benchmark = TurnBenchmark(tunables, motion_magic)
+    try:
+        return [benchmark.run(setpoint, duration) for setpoint in setpoints]
+    finally:
+        benchmark.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a DriveControl or Drivetrain tunable, "
+        "eg. turn_to_angle_kP=0.05",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=3.0, help="seconds to hold each setpoint"
+    )
+    parser.add_argument(
+        "--controller", choices=controllers, help="only benchmark one controller"
+    )
+    args = parser.parse_args()
+
+    tunables = {}
+    for override in args.set:
+        name, value = override.split("=")
+        tunables[name] = float(value)
+
+    print(
+        "controller             setpoint  settling (s)  overshoot (deg)  "
+        "steady-state (deg)  cpu (us)"
+    )
+    for controller in [args.controller] if args.controller else controllers:
+        results = run_benchmark(
+            tunables, args.duration, motion_magic=controller == "emulated_motion_magic"
+        )
+        for result in results:
+            settling = (
+                "-" if result.settling_time is None else f"{result.settling_time:.2f}"
+            )
+            print(
+                f"{controller:21}  {result.setpoint:8}  {settling:>12}  "
+                f"{result.overshoot:15.2f}  {result.steady_state_error:18.3f}  "
+                f"{result.cpu_time * 1e6:8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import math
+
 import wpimath.controller
 import magicbot
 from magicbot.state_machine import state
@@ -14,6 +16,10 @@ class DriveControl(magicbot.StateMachine):
 
     # variables to be injected
     navx: navx.AHRS
+    track_width: float
+    # if True, turns are run by the drive motors' Motion Magic profiles
+    # instead of the PID controller (only supported by TalonFX motors)
+    motion_magic: bool
 
     """`tunable` numbers can be modified via Network Tables, and their value
     is stored locally on the robot so it will be kept even after the robot
@@ -21,14 +27,39 @@ class DriveControl(magicbot.StateMachine):
     and different configuration values.
     """
     turn_to_angle_kP = tunable(0.03)
-    turn_to_angle_kI = tunable(0)
-    turn_to_angle_kD = tunable(0)
+    turn_to_angle_kI = tunable(0.0)
+    turn_to_angle_kD = tunable(0.0)
+    # degrees from the setpoint within which a turn is complete
+    turn_to_angle_tolerance = tunable(2.0)
+
+    # meters from their targets within which the wheels have reached them
+    wheel_tolerance = 0.01
 
     def setup(self):
+        if self.motion_magic and not self.drivetrain.supports_position_control():
+            raise Exception("Motion Magic turns require drivetrain position control")
         self.turn_to_angle_controller = wpimath.controller.PIDController(
             self.turn_to_angle_kP, self.turn_to_angle_kI, self.turn_to_angle_kD
         )
+        self.turn_to_angle_controller.setTolerance(self.turn_to_angle_tolerance)
         self.turn_to_angle_controller.enableContinuousInput(0, 360)
+        self.planned_setpoint = None
+        self.turn_to_angle_tunables = util.TunableBinding(
+            self,
+            (
+                "turn_to_angle_kP",
+                "turn_to_angle_kI",
+                "turn_to_angle_kD",
+                "turn_to_angle_tolerance",
+            ),
+            self.update_turn_to_angle_controller,
+        )
+
+    def update_turn_to_angle_controller(self):
+        self.turn_to_angle_controller.setPID(
+            self.turn_to_angle_kP, self.turn_to_angle_kI, self.turn_to_angle_kD
+        )
+        self.turn_to_angle_controller.setTolerance(self.turn_to_angle_tolerance)
 
     def set_angle(self, angle: float):
         self.turn_to_angle_controller.setSetpoint(angle)
@@ -42,21 +73,66 @@ class DriveControl(magicbot.StateMachine):
         self.engage(initial_state="turning_to_angle")
 
     def turn_to_angle(self, angle: float) -> None:
-        """Robot turns to set angle using a PID controller.
+        """Robot turns to set angle using a PID controller, or the motor
+        controllers if `motion_magic` is set.
 
         This is a control function for the state machine, meaning that it,
         and not the state itself, must be called to engage it.
         """
         self.set_angle(angle)
-        self.engage(initial_state="turning_to_angle")
+        if self.motion_magic:
+            self.engage(initial_state="turning_with_motion_magic")
+        else:
+            self.engage(initial_state="turning_to_angle")
+
+    def get_angle_error(self) -> float:
+        """Returns the degrees clockwise left to turn to the setpoint"""
+        setpoint = self.turn_to_angle_controller.getSetpoint()
+        return math.remainder(setpoint - self.navx.getAngle(), 360)
+
+    def at_angle(self) -> bool:
+        self.turn_to_angle_tunables.update()
+        tolerance = self.turn_to_angle_controller.getPositionTolerance()
+        return abs(self.get_angle_error()) <= tolerance
 
     @state(first=True)
     def turning_to_angle(self):
-        # update controller parameters with new data from networktables
-        self.turn_to_angle_controller.setPID(
-            self.turn_to_angle_kP, self.turn_to_angle_kI, self.turn_to_angle_kD
-        )
+        # update controller parameters if they were changed in networktables
+        self.turn_to_angle_tunables.update()
 
         measurement = self.navx.getAngle()
         output = self.turn_to_angle_controller.calculate(measurement)
         self.drivetrain.arcade_drive(0, -util.clamp(output, -0.3, 0.3))
+
+    @state
+    def turning_with_motion_magic(self, initial_call):
+        """Turns the heading error into opposite wheel travel for the motors'
+        Motion Magic profiles, so the loop here only has to check the result.
+        The wheels are sent on again from the gyro's heading if they reach
+        their targets without the robot reaching the angle (eg. because of
+        wheel scrub).
+        """
+        if initial_call:
+            # plan from the wheel positions once they are available
+            self.planned_setpoint = None
+        positions = self.drivetrain.get_wheel_positions()
+        if positions is None:
+            # the drivetrain takes its first readings in its execute(),
+            # which runs after this component's
+            return
+        left, right = positions
+        setpoint = self.turn_to_angle_controller.getSetpoint()
+        if setpoint != self.planned_setpoint:
+            replan = True
+        else:
+            reached = (
+                abs(self.wheel_targets[0] - left) < self.wheel_tolerance
+                and abs(self.wheel_targets[1] - right) < self.wheel_tolerance
+            )
+            replan = reached and not self.at_angle()
+        if replan:
+            self.planned_setpoint = setpoint
+            # the angle increases clockwise, which drives the left side forward
+            travel = math.radians(self.get_angle_error()) * self.track_width / 2
+            self.wheel_targets = (left + travel, right - travel)
+        self.drivetrain.drive_to_positions(*self.wheel_targets)
@@ -1,11 +1,12 @@
 import wpilib
 from wpilib.interfaces import MotorController
 from wpilib.drive import DifferentialDrive
-from magicbot import will_reset_to
+from magicbot import will_reset_to, tunable
 from rev import CANSparkBase
 from phoenix6.signals import NeutralModeValue
 
 from config import ControllerType
+import util
 
 
 class Drivetrain:
@@ -16,10 +17,25 @@ class Drivetrain:
     back_right_motor: MotorController
 
     controller_type: ControllerType
+    # distance the robot travels per rotation of a drive motor
+    meters_per_rotation: float
+    # if True, the motors are configured for `drive_to_positions()` (only
+    # supported by TalonFX motors); otherwise their configs are left alone
+    position_control: bool
 
     # values will reset to 0 after every time control loop runs
     forward = will_reset_to(0)
     turn = will_reset_to(0)
+    # if set, overrides `forward` and `turn` for one loop
+    wheel_targets = will_reset_to(None)
+
+    # Motion Magic profile limits and gains, per rotation of a motor's rotor
+    motion_magic_cruise_velocity = tunable(40.0)
+    motion_magic_acceleration = tunable(120.0)
+    motion_magic_kP = tunable(4.0)
+    motion_magic_kD = tunable(0.1)
+    motion_magic_kV = tunable(0.12)
+    motion_magic_kA = tunable(0.02)
 
     def setup(self):
         """Called after `createObjects()` has been called in the main robot class
@@ -34,12 +50,45 @@ class Drivetrain:
         self.right_motor_controller_group = wpilib.MotorControllerGroup(
             self.front_right_motor, self.back_right_motor
         )
+        # the right side is inverted by its motor controller group, not the
+        # motors, so it is negated wherever the motors are used directly
         self.right_motor_controller_group.setInverted(True)
         self.drive = DifferentialDrive(
             self.left_motor_controller_group, self.right_motor_controller_group
         )
         self.drive.setExpiration(0.1)
 
+        # sensor data can only be read in bulk from phoenix6 motors
+        if self.controller_type == ControllerType.TALON_FX:
+            self.telemetry = util.TalonFXTelemetry(
+                (
+                    self.front_left_motor,
+                    self.front_right_motor,
+                    self.back_left_motor,
+                    self.back_right_motor,
+                )
+            )
+        else:
+            self.telemetry = None
+
+        if self.position_control:
+            if self.controller_type != ControllerType.TALON_FX:
+                raise Exception("position control requires TalonFX motors")
+            self.motion_magic_tunables = util.TunableBinding(
+                self,
+                (
+                    "motion_magic_cruise_velocity",
+                    "motion_magic_acceleration",
+                    "motion_magic_kP",
+                    "motion_magic_kD",
+                    "motion_magic_kV",
+                    "motion_magic_kA",
+                ),
+                self.update_motion_magic,
+            )
+            # the first update applies the configs, before the robot is enabled
+            self.motion_magic_tunables.update()
+
     def on_enable(self):
         """Called when robot enters autonomous or teleoperated mode"""
         self.drive.setSafetyEnabled(True)
@@ -58,5 +107,84 @@ class Drivetrain:
         self.forward = forward
         self.turn = turn
 
+    def drive_to_positions(self, left: float, right: float):
+        """Makes each side's wheels travel to a position in meters along a
+        Motion Magic profile run by the motor controllers. Only supported
+        with `position_control` (see `supports_position_control()`).
+        """
+        self.wheel_targets = (left, right)
+
+    def supports_position_control(self) -> bool:
+        return self.position_control
+
+    def update_gains(self):
+        """Sends any tunables edited since the last update to the motors.
+        Configs block while they are applied, so this is called while the
+        robot is disabled rather than from `execute()`.
+        """
+        if self.position_control:
+            self.motion_magic_tunables.update()
+
+    def update_motion_magic(self):
+        """Sends the Motion Magic tunables to each motor, applying each
+        motor's configs once and all four in parallel
+        """
+        motors = (
+            self.front_left_motor,
+            self.front_right_motor,
+            self.back_left_motor,
+            self.back_right_motor,
+        )
+        with util.deferred_config(*motors):
+            for motor in motors:
+                motor.set_motion_magic(
+                    self.motion_magic_cruise_velocity, self.motion_magic_acceleration
+                )
+                motor.set_position_gains(
+                    self.motion_magic_kP,
+                    kd=self.motion_magic_kD,
+                    kv=self.motion_magic_kV,
+                    ka=self.motion_magic_kA,
+                )
+
+    def get_telemetry(self) -> util.TelemetrySnapshot:
+        """Returns the motor readings taken during the last `execute()`,
+        in the order front left, front right, back left, back right.
+        Returns None if the motors do not support this or no readings have
+        been taken yet.
+        """
+        if self.telemetry is None:
+            return None
+        return self.telemetry.snapshot
+
+    def get_wheel_positions(self) -> tuple[float, float]:
+        """Returns the distance in meters traveled by the left and right
+        wheels, as of the last `execute()`. Returns None if motor readings
+        are not available (see `get_telemetry()`).
+        """
+        telemetry = self.get_telemetry()
+        if telemetry is None:
+            return None
+        front_left, front_right, back_left, back_right = telemetry.motors
+        left = (front_left.position + back_left.position) / 2
+        # negated, see `setup()`
+        right = -(front_right.position + back_right.position) / 2
+        return (left * self.meters_per_rotation, right * self.meters_per_rotation)
+
     def execute(self):
-        self.drive.arcadeDrive(self.forward, self.turn)
+        if self.telemetry is not None:
+            self.telemetry.refresh()
+        if self.wheel_targets is None:
+            self.drive.arcadeDrive(self.forward, self.turn)
+            return
+
+        left, right = self.wheel_targets
+        left /= self.meters_per_rotation
+        # negated, see `setup()`
+        right /= -self.meters_per_rotation
+        self.front_left_motor.set_position(left)
+        self.back_left_motor.set_position(left)
+        self.front_right_motor.set_position(right)
+        self.back_right_motor.set_position(right)
+        # the motors are set directly, so tell the motor safety they were updated
+        self.drive.feed()
@@ -9,9 +9,12 @@ class ControllerType(Enum):
 
 
 # Configuration objects will be injected into component classes
+# (`wheel_diameter` and `track_width` are in meters, and `gear_ratio` is motor
+# rotations per wheel rotation)
 DrivetrainConfig = namedtuple(
     "DrivetrainConfig",
-    "front_left_id front_right_id back_left_id back_right_id controller_type",
+    "front_left_id front_right_id back_left_id back_right_id controller_type "
+    "wheel_diameter gear_ratio track_width",
 )
 pandemonium_cfg = DrivetrainConfig(
     front_left_id=15,
@@ -19,6 +22,9 @@ pandemonium_cfg = DrivetrainConfig(
     back_left_id=55,
     back_right_id=12,
     controller_type=ControllerType.TALON_SRX,
+    wheel_diameter=0.1524,
+    gear_ratio=10.71,
+    track_width=0.56,
 )
 pancake_cfg = DrivetrainConfig(
     front_left_id=8,
@@ -26,4 +32,7 @@ pancake_cfg = DrivetrainConfig(
     back_left_id=7,
     back_right_id=11,
     controller_type=ControllerType.TALON_FX,
+    wheel_diameter=0.1524,
+    gear_ratio=10.71,
+    track_width=0.56,
 )
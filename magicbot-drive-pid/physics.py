@@ -0,0 +1,168 @@
+"""Physics model used when the robot is simulated. pyfrc calls `update_sim()`
+once per robot loop on the simulated clock, so in tests a whole match runs
+as fast as the CPU allows.
+"""
+
+import math
+
+import wpilib
+from phoenix6.controls.motion_magic_voltage import MotionMagicVoltage
+from pyfrc.physics.core import PhysicsInterface
+from wpilib.simulation import DifferentialDrivetrainSim, SimDeviceSim
+from wpimath.system.plant import DCMotor
+from wpimath.trajectory import TrapezoidProfile
+
+from config import ControllerType
+from robot import drivetrain_cfg
+
+
+drive_motors = {
+    ControllerType.SPARK_MAX: DCMotor.NEO(2),
+    ControllerType.TALON_FX: DCMotor.falcon500(2),
+    ControllerType.TALON_SRX: DCMotor.CIM(2),
+}
+
+
+class MotionMagicSim:
+    """Emulates a TalonFX's Motion Magic position loop from its last request
+    and configuration. The phoenix6 simulation runs requests in real time,
+    so it can't be used when the physics runs faster than real time. Its
+    sensors lag behind for the same reason, so code run against the uncapped
+    physics reads wheel positions from the physics instead. The slot's
+    integral gain and the jerk limit are not emulated.
+    """
+
+    def __init__(self, motor):
+        self.motor = motor
+        # the profile's current position and velocity
+        self.setpoint = None
+
+    def voltage(
+        self, position: float, velocity: float, battery: float, dt: float
+    ) -> float:
+        """Returns the voltage applied to the motor over the next `dt`
+        seconds
+
+        Arguments:
+        position -- rotor position in rotations
+        velocity -- rotor velocity in rotations per second
+        battery -- battery voltage
+        """
+        request = getattr(self.motor, "request", None)
+        if not isinstance(request, MotionMagicVoltage):
+            self.setpoint = None
+            return self.motor.get() * battery
+
+        if self.setpoint is None:
+            self.setpoint = TrapezoidProfile.State(position, velocity)
+        limits = self.motor.config.motion_magic
+        profile = TrapezoidProfile(
+            TrapezoidProfile.Constraints(
+                limits.motion_magic_cruise_velocity, limits.motion_magic_acceleration
+            )
+        )
+        last_velocity = self.setpoint.velocity
+        self.setpoint = profile.calculate(
+            dt, self.setpoint, TrapezoidProfile.State(request.position, 0)
+        )
+        acceleration = (self.setpoint.velocity - last_velocity) / dt
+        gains = self.motor.config.slot1
+        volts = (
+            request.feed_forward
+            + math.copysign(gains.k_s, self.setpoint.velocity)
+            + gains.k_v * self.setpoint.velocity
+            + gains.k_a * acceleration
+            + gains.k_p * (self.setpoint.position - position)
+            + gains.k_d * (self.setpoint.velocity - velocity)
+        )
+        return max(-battery, min(volts, battery))
+
+
+class PhysicsEngine:
+    """Simulates the drivetrain from the configured wheel size, gearing and
+    track width, driven by the motor controllers' outputs. The navX's heading
+    is set from the drivetrain's, and TalonFX rotor positions and velocities
+    are fed back so their sensors read correctly.
+    """
+
+    # kitbot moment of inertia and mass
+    moment_of_inertia = 7.5
+    mass = 27.0
+
+    def __init__(self, physics_controller: PhysicsInterface, robot):
+        self.physics_controller = physics_controller
+        # the back motors are always given the same output as the front ones
+        self.left_motor = MotionMagicSim(robot.drivetrain_front_left_motor)
+        self.right_motor = MotionMagicSim(robot.drivetrain_front_right_motor)
+        self.drivetrain = DifferentialDrivetrainSim(
+            drive_motors[robot.drivetrain_controller_type],
+            drivetrain_cfg.gear_ratio,
+            self.moment_of_inertia,
+            self.mass,
+            drivetrain_cfg.wheel_diameter / 2,
+            drivetrain_cfg.track_width,
+        )
+
+        self.gyro_yaw = SimDeviceSim("navX-Sensor[4]").getDouble("Yaw")
+        self.gyro_yaw.set(0)
+        self.heading = 0.0
+
+        if robot.drivetrain_controller_type == ControllerType.TALON_FX:
+            self.left_talons = (
+                robot.drivetrain_front_left_motor.sim_state,
+                robot.drivetrain_back_left_motor.sim_state,
+            )
+            self.right_talons = (
+                robot.drivetrain_front_right_motor.sim_state,
+                robot.drivetrain_back_right_motor.sim_state,
+            )
+        else:
+            self.left_talons = self.right_talons = ()
+
+    def update_sim(self, now: float, tm_diff: float):
+        rotations_per_meter = drivetrain_cfg.gear_ratio / (
+            math.pi * drivetrain_cfg.wheel_diameter
+        )
+        if wpilib.DriverStation.isEnabled():
+            voltage = wpilib.RobotController.getBatteryVoltage()
+            # the right motors are inverted by their motor controller group
+            left = self.left_motor.voltage(
+                self.drivetrain.getLeftPosition() * rotations_per_meter,
+                self.drivetrain.getLeftVelocity() * rotations_per_meter,
+                voltage,
+                tm_diff,
+            )
+            right = -self.right_motor.voltage(
+                -self.drivetrain.getRightPosition() * rotations_per_meter,
+                -self.drivetrain.getRightVelocity() * rotations_per_meter,
+                voltage,
+                tm_diff,
+            )
+        else:
+            left = right = 0.0
+            self.left_motor.setpoint = self.right_motor.setpoint = None
+        self.drivetrain.setInputs(left, right)
+        self.drivetrain.update(tm_diff)
+        pose = self.drivetrain.getPose()
+        self.physics_controller.field.setRobotPose(pose)
+
+        # the navX angle is continuous and increases clockwise
+        degrees = pose.rotation().degrees()
+        self.heading += math.remainder(degrees - self.heading, 360)
+        self.gyro_yaw.set(-self.heading)
+
+        for talons, position, velocity in (
+            (
+                self.left_talons,
+                self.drivetrain.getLeftPosition(),
+                self.drivetrain.getLeftVelocity(),
+            ),
+            (
+                self.right_talons,
+                -self.drivetrain.getRightPosition(),
+                -self.drivetrain.getRightVelocity(),
+            ),
+        ):
+            for talon in talons:
+                talon.set_raw_rotor_position(position * rotations_per_meter)
+                talon.set_rotor_velocity(velocity * rotations_per_meter)
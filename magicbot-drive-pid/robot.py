@@ -4,11 +4,12 @@ magicbot state machine. Specifically, this program contains a PID controller
 that allows the robot to turn to a certain angle.
 """
 
+import math
+
 import wpilib
 from rev import CANSparkMax, CANSparkLowLevel
 import phoenix5
 from magicbot import MagicRobot, feedback
-import navx
 
 from components.drive_control import DriveControl
 from components.drivetrain import Drivetrain
@@ -17,6 +18,9 @@ import util
 
 
 drivetrain_cfg = config.pancake_cfg
+# run turns with the TalonFX Motion Magic profiles rather than the PID
+# controller (ignored for other motor controllers)
+motion_magic_turn = False
 
 
 class MyRobot(MagicRobot):
@@ -31,6 +35,16 @@ class MyRobot(MagicRobot):
     def createObjects(self):
         """Initialize all wpilib motors & sensors"""
         self.drivetrain_controller_type = drivetrain_cfg.controller_type
+        self.drivetrain_meters_per_rotation = (
+            math.pi * drivetrain_cfg.wheel_diameter / drivetrain_cfg.gear_ratio
+        )
+        self.drive_control_track_width = drivetrain_cfg.track_width
+        self.drive_control_motion_magic = (
+            motion_magic_turn
+            and drivetrain_cfg.controller_type == config.ControllerType.TALON_FX
+        )
+        # the motors are only configured for Motion Magic if it is used
+        self.drivetrain_position_control = self.drive_control_motion_magic
         if drivetrain_cfg.controller_type == config.ControllerType.SPARK_MAX:
             self.drivetrain_front_left_motor = CANSparkMax(
                 drivetrain_cfg.front_left_id, CANSparkLowLevel.MotorType.kBrushless
@@ -46,16 +60,16 @@ class MyRobot(MagicRobot):
             )
         elif drivetrain_cfg.controller_type == config.ControllerType.TALON_FX:
             self.drivetrain_front_left_motor = util.WPI_TalonFX(
-                drivetrain_cfg.front_left_id
+                drivetrain_cfg.front_left_id, dedupe=True
             )
             self.drivetrain_front_right_motor = util.WPI_TalonFX(
-                drivetrain_cfg.front_right_id
+                drivetrain_cfg.front_right_id, dedupe=True
             )
             self.drivetrain_back_left_motor = util.WPI_TalonFX(
-                drivetrain_cfg.back_left_id
+                drivetrain_cfg.back_left_id, dedupe=True
             )
             self.drivetrain_back_right_motor = util.WPI_TalonFX(
-                drivetrain_cfg.back_right_id
+                drivetrain_cfg.back_right_id, dedupe=True
             )
         elif drivetrain_cfg.controller_type == config.ControllerType.TALON_SRX:
             self.drivetrain_front_left_motor = phoenix5.WPI_TalonSRX(
@@ -75,22 +89,37 @@ class MyRobot(MagicRobot):
                 f"Improper controller type in `drivetrain_cfg`: {drivetrain_cfg.controller_type}"
             )
 
-        self.navx = navx.AHRS.create_spi()
+        self.navx = util.create_navx()
         self.joystick = wpilib.Joystick(0)
-        self.curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1)
+        # half speed while the thumb button is held, and ramped to avoid
+        # current spikes
+        curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1, compiled=True)
+        self.drive_inputs = (
+            util.InputShaper(lambda: self.joystick.getRawButton(2))
+            .add_axis(self.joystick.getY, curve, rate_limit=2.0)
+            .add_axis(self.joystick.getX, curve, rate_limit=4.0, invert=True)
+        )
+
+    def teleopInit(self):
+        self.drive_inputs.reset()
 
     def teleopPeriodic(self):
         """Place code here that does things as a result of operator
         actions"""
 
         with self.consumeExceptions():
+            # shaped every loop so the rate limits track the stick
+            forward, turn = self.drive_inputs.update()
             # state machine will only execute when button is held for safety reasons
             if self.joystick.getTrigger():
                 self.drive_control.turn_to_angle(180)
             else:
-                self.drivetrain.arcade_drive(
-                    self.curve(self.joystick.getY()), -self.curve(self.joystick.getX())
-                )
+                self.drivetrain.arcade_drive(forward, turn)
+
+    def disabledPeriodic(self):
+        # applying motor configs blocks, so tunables are only sent while disabled
+        with self.consumeExceptions():
+            self.drivetrain.update_gains()
 
     @feedback
     def get_angle(self):
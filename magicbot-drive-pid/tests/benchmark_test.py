@@ -0,0 +1,31 @@
+import benchmark
+
+
+def test_benchmark_turns_to_every_setpoint():
+    results = benchmark.run_benchmark(duration=3.0)
+    assert [result.setpoint for result in results] == list(benchmark.setpoints)
+    for result in results:
+        assert result.overshoot >= 0
+        assert result.steady_state_error < 5
+    # the short turn settles first, since it goes back across 0
+    assert results[0].settling_time is not None
+    assert results[3].settling_time < results[0].settling_time
+
+
+def test_benchmark_overshoots_with_high_gain():
+    results = benchmark.run_benchmark({"turn_to_angle_kP": 1.0}, duration=3.0)
+    assert all(result.overshoot > 0 for result in results)
+
+
+def test_benchmark_emulated_motion_magic_settles_faster_than_pid():
+    """Compares against `physics.MotionMagicSim`'s emulation of the motors'
+    Motion Magic loops, not the phoenix6 simulation
+    """
+    pid = benchmark.run_benchmark(duration=3.0)
+    motion_magic = benchmark.run_benchmark(duration=3.0, motion_magic=True)
+    for pid_result, result in zip(pid, motion_magic):
+        assert result.settling_time is not None
+        assert pid_result.settling_time is None or (
+            result.settling_time < pid_result.settling_time
+        )
+        assert result.steady_state_error < benchmark.TurnBenchmark.tolerance
@@ -0,0 +1,62 @@
+import math
+import time
+from types import SimpleNamespace
+
+from magicbot.magic_tunable import setup_tunables
+
+from components.drive_control import DriveControl
+
+
+def test_motion_magic_turn_waits_for_wheel_positions():
+    positions = None
+    targets = []
+    drive_control = DriveControl()
+    drive_control.drivetrain = SimpleNamespace(
+        supports_position_control=lambda: True,
+        get_wheel_positions=lambda: positions,
+        drive_to_positions=lambda left, right: targets.append((left, right)),
+    )
+    drive_control.navx = SimpleNamespace(getAngle=lambda: 0.0)
+    drive_control.track_width = 0.5
+    drive_control.motion_magic = True
+    setup_tunables(drive_control, "drive_control_test")
+    drive_control.setup()
+    try:
+        # the drivetrain has not taken any readings yet
+        drive_control.turn_to_angle(90)
+        drive_control.execute()
+        assert drive_control.current_state == "turning_with_motion_magic"
+        assert targets == []
+
+        positions = (1.0, 2.0)
+        drive_control.turn_to_angle(90)
+        drive_control.execute()
+        travel = math.radians(90) * 0.5 / 2
+        assert targets == [(1.0 + travel, 2.0 - travel)]
+    finally:
+        drive_control.turn_to_angle_tunables.close()
+
+
+def test_at_angle_tolerance_only_read_when_changed():
+    drive_control = DriveControl()
+    drive_control.drivetrain = SimpleNamespace(supports_position_control=lambda: False)
+    drive_control.navx = SimpleNamespace(getAngle=lambda: 3.0)
+    drive_control.motion_magic = False
+    setup_tunables(drive_control, "drive_control_test")
+    drive_control.setup()
+    tolerance = drive_control.turn_to_angle_tolerance
+    try:
+        drive_control.set_angle(0)
+        assert not drive_control.at_angle()
+
+        drive_control.turn_to_angle_tolerance = 5.0
+        # wait for the networktables listener to see the edit
+        deadline = time.monotonic() + 1.0
+        while not drive_control.turn_to_angle_tunables._dirty:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+        assert drive_control.turn_to_angle_controller.getPositionTolerance() == tolerance
+        assert drive_control.at_angle()
+    finally:
+        drive_control.turn_to_angle_tunables.close()
+        drive_control.turn_to_angle_tolerance = tolerance
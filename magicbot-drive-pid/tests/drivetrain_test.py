@@ -0,0 +1,90 @@
+import math
+import time
+
+from magicbot.magic_tunable import setup_tunables
+from phoenix6.status_code import StatusCode
+
+from components.drivetrain import Drivetrain
+from config import ControllerType
+import util
+
+
+def make_drivetrain(position_control: bool) -> tuple[Drivetrain, list]:
+    """Returns a set up drivetrain and the sub-configs applied to each of its
+    motors, by motor
+    """
+    motors = [util.WPI_TalonFX(id) for id in range(51, 55)]
+    applied = [[] for _ in motors]
+    for motor, configs in zip(motors, applied):
+
+        def apply(config, timeout=0.05, configs=configs):
+            configs.append(config)
+            return StatusCode.OK
+
+        motor.configurator.apply = apply
+    drivetrain = Drivetrain()
+    drivetrain.front_left_motor = motors[0]
+    drivetrain.front_right_motor = motors[1]
+    drivetrain.back_left_motor = motors[2]
+    drivetrain.back_right_motor = motors[3]
+    drivetrain.controller_type = ControllerType.TALON_FX
+    drivetrain.meters_per_rotation = 0.05
+    drivetrain.position_control = position_control
+    setup_tunables(drivetrain, "drivetrain_test")
+    drivetrain.setup()
+    return drivetrain, applied
+
+
+def test_drivetrain_leaves_configs_without_position_control():
+    drivetrain, applied = make_drivetrain(position_control=False)
+    drivetrain.update_gains()
+    assert not drivetrain.supports_position_control()
+    assert applied == [[], [], [], []]
+
+
+def test_drivetrain_applies_motion_magic_sub_configs():
+    drivetrain, applied = make_drivetrain(position_control=True)
+    try:
+        motors = (
+            drivetrain.front_left_motor,
+            drivetrain.front_right_motor,
+            drivetrain.back_left_motor,
+            drivetrain.back_right_motor,
+        )
+        for motor, configs in zip(motors, applied):
+            assert len(configs) == 2
+            assert configs[0] is motor.config.motion_magic
+            assert configs[1] is motor.config.slot1
+        assert motors[0].config.slot1.k_p == drivetrain.motion_magic_kP
+    finally:
+        drivetrain.motion_magic_tunables.close()
+
+
+def test_wheel_positions_from_telemetry():
+    drivetrain, _ = make_drivetrain(position_control=False)
+    motors = (
+        drivetrain.front_left_motor,
+        drivetrain.front_right_motor,
+        drivetrain.back_left_motor,
+        drivetrain.back_right_motor,
+    )
+    # driving forward turns the inverted right side motors backwards
+    positions = [2.0, -1.0, 4.0, -3.0]
+    assert drivetrain.get_wheel_positions() is None
+    for motor, position in zip(motors, positions):
+        motor.sim_state.set_raw_rotor_position(position)
+        motor.sim_state.set_rotor_velocity(0)
+    drivetrain.arcade_drive(0, 0)
+    drivetrain.wheel_targets = None
+    # wait for the simulated motors to report their new state
+    for _ in range(100):
+        drivetrain.execute()
+        telemetry = drivetrain.get_telemetry()
+        if [motor.position for motor in telemetry.motors] == positions:
+            break
+        time.sleep(0.01)
+
+    assert [motor.position for motor in telemetry.motors] == positions
+    left, right = drivetrain.get_wheel_positions()
+    assert math.isclose(left, 3.0 * drivetrain.meters_per_rotation)
+    assert math.isclose(right, 2.0 * drivetrain.meters_per_rotation)
@@ -0,0 +1,78 @@
+import math
+import time
+from types import SimpleNamespace
+
+import wpilib
+from wpilib.simulation import DriverStationSim
+
+from config import ControllerType
+from physics import PhysicsEngine
+import util
+
+
+def make_engine(left: float, right: float) -> PhysicsEngine:
+    """Returns a physics engine for a robot whose left and right motors are
+    set to the given outputs
+    """
+    motors = [util.WPI_TalonFX(i) for i in range(1, 5)]
+    for motor, output in zip(motors, (left, right, left, right)):
+        motor.set(output)
+    robot = SimpleNamespace(
+        drivetrain_controller_type=ControllerType.TALON_FX,
+        drivetrain_front_left_motor=motors[0],
+        drivetrain_front_right_motor=motors[1],
+        drivetrain_back_left_motor=motors[2],
+        drivetrain_back_right_motor=motors[3],
+    )
+    physics_controller = SimpleNamespace(field=wpilib.Field2d())
+    return PhysicsEngine(physics_controller, robot)
+
+
+def enable():
+    DriverStationSim.setEnabled(True)
+    DriverStationSim.notifyNewData()
+
+
+def test_physics_drives_forward():
+    enable()
+    # the right motors are inverted by their motor controller group
+    engine = make_engine(0.5, -0.5)
+    for _ in range(50):
+        engine.update_sim(0, 0.02)
+    pose = engine.drivetrain.getPose()
+    assert pose.X() > 1
+    assert abs(pose.Y()) < 1e-6
+    assert abs(pose.rotation().degrees()) < 1e-6
+
+
+def test_physics_turns():
+    enable()
+    engine = make_engine(0.5, 0.5)
+    for _ in range(50):
+        engine.update_sim(0, 0.02)
+    # turning in place clockwise
+    assert engine.drivetrain.getPose().translation().norm() < 1e-6
+    assert engine.drivetrain.getHeading().degrees() < -10
+
+
+def test_physics_full_match_uncapped():
+    enable()
+    engine = make_engine(0.3, -0.2)
+    start = time.perf_counter()
+    # 150 simulated seconds, one update per 20 ms robot loop
+    for _ in range(7500):
+        engine.update_sim(0, 0.02)
+    # faster than real time
+    assert time.perf_counter() - start < 150
+
+
+def test_physics_gyro_follows_heading():
+    enable()
+    gyro = util.create_navx()
+    engine = make_engine(0.5, 0.5)
+    for _ in range(500):
+        engine.update_sim(0, 0.02)
+    heading = engine.drivetrain.getHeading().degrees()
+    # continuous, clockwise positive, and past a full turn
+    assert gyro.getAngle() > 360
+    assert math.isclose(math.remainder(gyro.getAngle() + heading, 360), 0, abs_tol=1e-6)
@@ -6,6 +6,7 @@ from rev import CANSparkBase
 from phoenix6.signals import NeutralModeValue
 
 from config import ControllerType
+import util
 
 
 class Drivetrain:
@@ -40,6 +41,19 @@ class Drivetrain:
         )
         self.drive.setExpiration(0.1)
 
+        # sensor data can only be read in bulk from phoenix6 motors
+        if self.controller_type == ControllerType.TALON_FX:
+            self.telemetry = util.TalonFXTelemetry(
+                (
+                    self.front_left_motor,
+                    self.front_right_motor,
+                    self.back_left_motor,
+                    self.back_right_motor,
+                )
+            )
+        else:
+            self.telemetry = None
+
     def on_enable(self):
         """Called when robot enters autonomous or teleoperated mode"""
         self.drive.setSafetyEnabled(True)
@@ -58,5 +72,17 @@ class Drivetrain:
         self.forward = forward
         self.turn = turn
 
+    def get_telemetry(self) -> util.TelemetrySnapshot:
+        """Returns the motor readings taken during the last `execute()`,
+        in the order front left, front right, back left, back right.
+        Returns None if the motors do not support this or no readings have
+        been taken yet.
+        """
+        if self.telemetry is None:
+            return None
+        return self.telemetry.snapshot
+
     def execute(self):
+        if self.telemetry is not None:
+            self.telemetry.refresh()
         self.drive.arcadeDrive(self.forward, self.turn)
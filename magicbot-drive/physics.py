@@ -0,0 +1,81 @@
+"""Physics model used when the robot is simulated. pyfrc calls `update_sim()`
+once per robot loop on the simulated clock, so in tests a whole match runs
+as fast as the CPU allows.
+"""
+
+import math
+
+import wpilib
+from wpilib.simulation import DifferentialDrivetrainSim
+from pyfrc.physics.core import PhysicsInterface
+
+from config import ControllerType
+
+
+kitbot_motors = {
+    ControllerType.SPARK_MAX: DifferentialDrivetrainSim.KitbotMotor.DualNEOPerSide,
+    ControllerType.TALON_FX: DifferentialDrivetrainSim.KitbotMotor.DualFalcon500PerSide,
+    ControllerType.TALON_SRX: DifferentialDrivetrainSim.KitbotMotor.DualCIMPerSide,
+}
+
+
+class PhysicsEngine:
+    """Simulates the drivetrain as a kitbot with 6 inch wheels and a 10.71:1
+    gearbox, driven by the motor controllers' outputs. TalonFX rotor
+    positions and velocities are fed back so their sensors read correctly.
+    """
+
+    gear_ratio = 10.71
+    wheel_diameter = 0.1524
+
+    def __init__(self, physics_controller: PhysicsInterface, robot):
+        self.physics_controller = physics_controller
+        # the back motors are always given the same output as the front ones
+        self.left_motor = robot.drivetrain_front_left_motor
+        self.right_motor = robot.drivetrain_front_right_motor
+        self.drivetrain = DifferentialDrivetrainSim.createKitbotSim(
+            kitbot_motors[robot.drivetrain_controller_type],
+            DifferentialDrivetrainSim.KitbotGearing.k10p71,
+            DifferentialDrivetrainSim.KitbotWheelSize.kSixInch,
+        )
+
+        if robot.drivetrain_controller_type == ControllerType.TALON_FX:
+            self.left_talons = (
+                robot.drivetrain_front_left_motor.sim_state,
+                robot.drivetrain_back_left_motor.sim_state,
+            )
+            self.right_talons = (
+                robot.drivetrain_front_right_motor.sim_state,
+                robot.drivetrain_back_right_motor.sim_state,
+            )
+        else:
+            self.left_talons = self.right_talons = ()
+
+    def update_sim(self, now: float, tm_diff: float):
+        if wpilib.DriverStation.isEnabled():
+            voltage = wpilib.RobotController.getBatteryVoltage()
+            # the right motors are inverted by their motor controller group
+            left = self.left_motor.get() * voltage
+            right = -self.right_motor.get() * voltage
+        else:
+            left = right = 0.0
+        self.drivetrain.setInputs(left, right)
+        self.drivetrain.update(tm_diff)
+        self.physics_controller.field.setRobotPose(self.drivetrain.getPose())
+
+        rotations_per_meter = self.gear_ratio / (math.pi * self.wheel_diameter)
+        for talons, position, velocity in (
+            (
+                self.left_talons,
+                self.drivetrain.getLeftPosition(),
+                self.drivetrain.getLeftVelocity(),
+            ),
+            (
+                self.right_talons,
+                -self.drivetrain.getRightPosition(),
+                -self.drivetrain.getRightVelocity(),
+            ),
+        ):
+            for talon in talons:
+                talon.set_raw_rotor_position(position * rotations_per_meter)
+                talon.set_rotor_velocity(velocity * rotations_per_meter)
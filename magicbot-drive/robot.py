@@ -41,16 +41,16 @@ class MyRobot(MagicRobot):
             )
         elif drivetrain_cfg.controller_type == config.ControllerType.TALON_FX:
             self.drivetrain_front_left_motor = util.WPI_TalonFX(
-                drivetrain_cfg.front_left_id
+                drivetrain_cfg.front_left_id, dedupe=True
             )
             self.drivetrain_front_right_motor = util.WPI_TalonFX(
-                drivetrain_cfg.front_right_id
+                drivetrain_cfg.front_right_id, dedupe=True
             )
             self.drivetrain_back_left_motor = util.WPI_TalonFX(
-                drivetrain_cfg.back_left_id
+                drivetrain_cfg.back_left_id, dedupe=True
             )
             self.drivetrain_back_right_motor = util.WPI_TalonFX(
-                drivetrain_cfg.back_right_id
+                drivetrain_cfg.back_right_id, dedupe=True
             )
         elif drivetrain_cfg.controller_type == config.ControllerType.TALON_SRX:
             self.drivetrain_front_left_motor = phoenix5.WPI_TalonSRX(
@@ -71,16 +71,25 @@ class MyRobot(MagicRobot):
             )
 
         self.joystick = wpilib.Joystick(0)
-        self.curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1)
+        # half speed while the thumb button is held, and ramped to avoid
+        # current spikes
+        curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1, compiled=True)
+        self.drive_inputs = (
+            util.InputShaper(lambda: self.joystick.getRawButton(2))
+            .add_axis(self.joystick.getY, curve, rate_limit=2.0)
+            .add_axis(self.joystick.getX, curve, rate_limit=4.0, invert=True)
+        )
+
+    def teleopInit(self):
+        self.drive_inputs.reset()
 
     def teleopPeriodic(self):
         """Place code here that does things as a result of operator
         actions"""
 
         try:
-            self.drivetrain.arcade_drive(
-                self.curve(self.joystick.getY()), -self.curve(self.joystick.getX())
-            )
+            forward, turn = self.drive_inputs.update()
+            self.drivetrain.arcade_drive(forward, turn)
         except:
             self.onException()
 
@@ -1,11 +1,27 @@
-from typing import Callable
+import math
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable
 
+import numpy as np
+
+import navx
+from ntcore import NetworkTableInstance, EventFlags
+from wpilib import RobotBase, SPI, Timer
 from wpilib.interfaces import MotorController
+from wpilib.simulation import SimDeviceSim
+from wpimath.filter import SlewRateLimiter
+from wpimath.geometry import Rotation2d
+from phoenix6.base_status_signal import BaseStatusSignal
 from phoenix6.hardware.talon_fx import TalonFX
 from phoenix6.configs.talon_fx_configs import TalonFXConfiguration
 from phoenix6.controls.duty_cycle_out import DutyCycleOut
+from phoenix6.controls.motion_magic_voltage import MotionMagicVoltage
+from phoenix6.controls.velocity_voltage import VelocityVoltage
 from phoenix6.controls.voltage_out import VoltageOut
 from phoenix6.signals import InvertedValue, NeutralModeValue
+from phoenix6.status_code import StatusCode
 
 
 def clamp(value: float, min_value: float, max_value: float) -> float:
@@ -14,7 +30,12 @@ def clamp(value: float, min_value: float, max_value: float) -> float:
 
 
 def curve(
-    mapping: Callable[[float], float], offset: float, deadband: float, max_mag: float
+    mapping: Callable[[float], float],
+    offset: float,
+    deadband: float,
+    max_mag: float,
+    compiled: bool = False,
+    table_size: int = 1024,
 ) -> Callable[[float], float]:
     """Return a function that applies a curve to an input.
 
@@ -25,6 +46,18 @@ def curve(
         the input is treated as zero
     max_mag -- restricts the output magnitude to a maximum.
         If this is 0, no restriction is applied.
+    compiled -- if True, the curve is sampled into a lookup table over
+        [-1, 1] when it is built and calls interpolate between entries
+        instead of calling `mapping`. Inputs outside [-1, 1] fall back to
+        the exact curve.
+    table_size -- number of intervals in the lookup table. The error of a
+        compiled curve is at most M * h**2 / 8, where h = 2 / table_size
+        and M bounds the magnitude of the second derivative of `mapping`
+        (plus h / 4 times any change in slope from clamping).
+
+    The returned function also has an `array` attribute, which applies the
+    exact curve to every element of a numpy array at once (useful when
+    replaying logged inputs).
     """
 
     def f(input_val: float) -> float:
@@ -37,7 +70,45 @@ def curve(
         else:
             return clamp(output_val, -max_mag, max_mag)
 
-    return f
+    def f_array(input_vals: np.ndarray) -> np.ndarray:
+        """Apply a curve to every element of an array"""
+        input_vals = np.asarray(input_vals, dtype=float)
+        try:
+            mapped = mapping(input_vals)
+        except (TypeError, ValueError):
+            # mapping uses functions (eg. from `math`) that only take scalars,
+            # or branches on its input
+            mapped = np.vectorize(mapping, otypes=[float])(input_vals)
+        output_vals = mapped + offset
+        if max_mag != 0:
+            output_vals = np.clip(output_vals, -max_mag, max_mag)
+        return np.where(np.abs(input_vals) < deadband, offset, output_vals)
+
+    f.array = f_array
+    if not compiled:
+        return f
+
+    # the deadband is kept as a comparison rather than sampled into the
+    # table so that the jump at its edge is reproduced exactly
+    exact = curve(mapping, offset, 0, max_mag)
+    step = 2 / table_size
+    points = [exact(-1 + i * step) for i in range(table_size + 1)]
+    values = points[:-1]
+    slopes = [b - a for a, b in zip(points, points[1:])]
+    scale = table_size / 2
+
+    def compiled_f(input_val: float) -> float:
+        """Apply a curve to an input using the lookup table"""
+        if -deadband < input_val < deadband:
+            return offset
+        position = (input_val + 1) * scale
+        if 0 <= position < table_size:
+            i = int(position)
+            return values[i] + slopes[i] * (position - i)
+        return f(input_val)
+
+    compiled_f.array = f_array
+    return compiled_f
 
 
 def linear_curve(
@@ -45,8 +116,9 @@ def linear_curve(
     offset: float = 0.0,
     deadband: float = 0.0,
     max_mag: float = 0.0,
+    compiled: bool = False,
 ) -> Callable[[float], float]:
-    return curve(lambda x: scalar * x, offset, deadband, max_mag)
+    return curve(lambda x: scalar * x, offset, deadband, max_mag, compiled)
 
 
 def ollie_curve(
@@ -54,8 +126,9 @@ def ollie_curve(
     offset: float = 0.0,
     deadband: float = 0.0,
     max_mag: float = 0.0,
+    compiled: bool = False,
 ) -> Callable[[float], float]:
-    return curve(lambda x: scalar * x * abs(x), offset, deadband, max_mag)
+    return curve(lambda x: scalar * x * abs(x), offset, deadband, max_mag, compiled)
 
 
 def cubic_curve(
@@ -63,8 +136,83 @@ def cubic_curve(
     offset: float = 0.0,
     deadband: float = 0.0,
     max_mag: float = 0.0,
+    compiled: bool = False,
 ) -> Callable[[float], float]:
-    return curve(lambda x: scalar * x**3, offset, deadband, max_mag)
+    return curve(lambda x: scalar * x**3, offset, deadband, max_mag, compiled)
+
+
+class InputShaper:
+    """Shapes driver inputs for one loop in a single call. Each axis is read
+    from its source, passed through its shape (such as a `curve()`, which
+    also applies the deadband), scaled down while precision mode is on and
+    then slew rate limited, so that a flick of the stick can't step the
+    motors' output and cause a current spike or brownout. Scaling comes
+    before the rate limit so that switching precision mode is smoothed too.
+
+    All stages are created as axes are added, and `update()` writes into the
+    same `outputs` list every loop.
+    """
+
+    def __init__(
+        self, precision: Callable[[], bool] = None, precision_scale: float = 0.5
+    ):
+        """Arguments:
+        precision -- returns True while precision mode is on, eg. a button
+        precision_scale -- multiplies every axis in precision mode
+        """
+        self.precision = precision
+        self.precision_scale = precision_scale
+        self.outputs = []
+        self._axes = []
+        self._limiters = []
+
+    def add_axis(
+        self,
+        source: Callable[[], float],
+        shape: Callable[[float], float],
+        rate_limit: float = 0.0,
+        invert: bool = False,
+    ) -> "InputShaper":
+        """Add an axis, whose output will be `outputs[n]` for the nth axis
+        added. Returns the shaper, so calls can be chained.
+
+        Arguments:
+        source -- returns the axis's raw value, eg. `joystick.getY`
+        shape -- maps the raw value to an output, eg. a `curve()`
+        rate_limit -- the most the output may change per second.
+            If this is 0, no limit is applied.
+        invert -- if True, the output is negated
+        """
+        if rate_limit:
+            limiter = SlewRateLimiter(rate_limit)
+            self._limiters.append(limiter)
+            limit = limiter.calculate
+        else:
+            limit = None
+        self._axes.append((source, shape, -1.0 if invert else 1.0, limit))
+        self.outputs.append(0.0)
+        return self
+
+    def update(self) -> list[float]:
+        """Read and shape every axis, and return `outputs`"""
+        if self.precision is not None and self.precision():
+            scale = self.precision_scale
+        else:
+            scale = 1.0
+        outputs = self.outputs
+        i = 0
+        for source, shape, sign, limit in self._axes:
+            value = shape(source()) * sign * scale
+            outputs[i] = value if limit is None else limit(value)
+            i += 1
+        return outputs
+
+    def reset(self):
+        """Zero every output and rate limit, eg. when teleop starts"""
+        for limiter in self._limiters:
+            limiter.reset(0)
+        for i in range(len(self.outputs)):
+            self.outputs[i] = 0.0
 
 
 class WPI_TalonFX(TalonFX, MotorController):
@@ -72,22 +220,107 @@ class WPI_TalonFX(TalonFX, MotorController):
     the wpilib MotorController interface, making it possible
     to use TalonFX controllers in, for example, MotorControllerGroup
     and DifferentialDrive
+
+    If `dedupe` is True, a control request identical to the last one sent
+    is skipped unless `keep_alive` seconds have passed since it was last
+    sent. `frames_sent` and `frames_skipped` count how often each happens.
+
+    Configuration setters such as `setInverted()` update `config` and apply
+    only the sub-configs they change (eg. `config.motor_output`), so other
+    device settings are left as they are. While `defer_config` is True, the
+    changed sub-configs are only staged, and are sent by `flush_config()`.
+
+    `set_velocity()` runs the motor controller's own velocity loop (using
+    the slot 0 gains) at 1 kHz, instead of a loop in robot code, and
+    `set_position()` does the same for a Motion Magic profile to a position
+    (using the slot 1 gains). `request` is the last control request made,
+    whether or not it was sent.
     """
 
-    def __init__(self, device_id: int, canbus: str = "", enable_foc: bool = False):
+    def __init__(
+        self,
+        device_id: int,
+        canbus: str = "",
+        enable_foc: bool = False,
+        dedupe: bool = False,
+        keep_alive: float = 0.05,
+    ):
         TalonFX.__init__(self, device_id, canbus=canbus)
         MotorController.__init__(self)
         self.config = TalonFXConfiguration()
         self.duty_cycle_out = DutyCycleOut(0, enable_foc=enable_foc)
         self.voltage_out = VoltageOut(0, enable_foc=enable_foc)
+        self.velocity_voltage = VelocityVoltage(0, enable_foc=enable_foc)
+        self.motion_magic_voltage = MotionMagicVoltage(0, enable_foc=enable_foc, slot=1)
+        self.request = self.duty_cycle_out
         self.is_disabled = False
 
+        self.dedupe = dedupe
+        self.keep_alive = keep_alive
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self._last_request = None
+        self._last_output = None
+        self._last_sent = 0.0
+
+        self.defer_config = False
+        # staged sub-configs of `config`, by id so each is applied once
+        self._dirty_configs = {}
+
+    def _send(self, request, output):
+        """Send a control request, skipping it if it is a duplicate
+
+        Arguments:
+        output -- the request's setpoint, compared to tell duplicates apart
+        """
+        self.request = request
+        if self.dedupe:
+            now = Timer.getFPGATimestamp()
+            if (
+                request is self._last_request
+                and output == self._last_output
+                and now - self._last_sent < self.keep_alive
+            ):
+                self.frames_skipped += 1
+                return
+            self._last_request = request
+            self._last_output = output
+            self._last_sent = now
+        self.set_control(request)
+        self.frames_sent += 1
+
+    def _apply_config(self, config):
+        """Applies `config`, a sub-config of `self.config`, or stages it while
+        `defer_config` is True
+        """
+        if self.defer_config:
+            self._dirty_configs[id(config)] = config
+        else:
+            self.configurator.apply(config)
+
+    def flush_config(self, timeout: float = 0.1) -> StatusCode:
+        """Apply the sub-configs changed while `defer_config` was True.
+        Blocks for at most `timeout` seconds per sub-config. Any that fail
+        to apply stay staged.
+        """
+        for key, config in list(self._dirty_configs.items()):
+            status = self.configurator.apply(config, timeout)
+            if not status.is_ok():
+                return status
+            del self._dirty_configs[key]
+        return StatusCode.OK
+
     def disable(self):
         self.stopMotor()
         self.is_disabled = True
 
     def get(self) -> float:
-        return self.duty_cycle_out.output
+        """Returns the duty cycle set by `set()`, or the duty cycle the motor
+        reports applying while it follows any other control request
+        """
+        if self.request is self.duty_cycle_out:
+            return self.duty_cycle_out.output
+        return self.get_duty_cycle().value
 
     def getInverted(self) -> bool:
         return (
@@ -98,7 +331,7 @@ class WPI_TalonFX(TalonFX, MotorController):
     def set(self, speed: float):
         if not self.is_disabled:
             self.duty_cycle_out.output = speed
-            self.set_control(self.duty_cycle_out)
+            self._send(self.duty_cycle_out, speed)
 
     def setIdleMode(self, mode: NeutralModeValue):
         """Set the idle mode setting
@@ -107,19 +340,286 @@ class WPI_TalonFX(TalonFX, MotorController):
         mode -- Idle mode (coast or brake)
         """
         self.config.motor_output.neutral_mode = mode
-        self.configurator.apply(self.config)
+        self._apply_config(self.config.motor_output)
 
     def setInverted(self, isInverted: bool):
         if isInverted:
             self.config.motor_output.inverted = InvertedValue.CLOCKWISE_POSITIVE
         else:
             self.config.motor_output.inverted = InvertedValue.COUNTER_CLOCKWISE_POSITIVE
-        self.configurator.apply(self.config)
+        self._apply_config(self.config.motor_output)
 
     def setVoltage(self, volts: float):
         if not self.is_disabled:
             self.voltage_out.output = volts
-            self.set_control(self.voltage_out)
+            self._send(self.voltage_out, volts)
+
+    def set_velocity(self, velocity: float, feedforward: float = 0.0):
+        """Run the onboard velocity loop
+
+        Arguments:
+        velocity -- target rotor velocity in rotations per second
+        feedforward -- volts added to the loop's output
+        """
+        if not self.is_disabled:
+            self.velocity_voltage.velocity = velocity
+            self.velocity_voltage.feed_forward = feedforward
+            self._send(self.velocity_voltage, (velocity, feedforward))
+
+    def set_velocity_gains(self, kp: float, ki: float = 0.0, kd: float = 0.0):
+        """Set the slot 0 gains of the onboard velocity loop, in volts per
+        rotation per second of error (and its integral and derivative)
+        """
+        self.config.slot0.k_p = kp
+        self.config.slot0.k_i = ki
+        self.config.slot0.k_d = kd
+        self._apply_config(self.config.slot0)
+
+    def set_position(self, position: float, feedforward: float = 0.0):
+        """Move to a position along a Motion Magic profile
+
+        Arguments:
+        position -- target rotor position in rotations
+        feedforward -- volts added to the loop's output
+        """
+        if not self.is_disabled:
+            self.motion_magic_voltage.position = position
+            self.motion_magic_voltage.feed_forward = feedforward
+            self._send(self.motion_magic_voltage, (position, feedforward))
+
+    def set_position_gains(
+        self,
+        kp: float,
+        ki: float = 0.0,
+        kd: float = 0.0,
+        ks: float = 0.0,
+        kv: float = 0.0,
+        ka: float = 0.0,
+    ):
+        """Set the slot 1 gains of the onboard position loop, in volts per
+        rotation of error (and its integral and derivative). `ks`, `kv` and
+        `ka` are the volts to overcome friction, per rotation per second of
+        the profile's velocity and per rotation per second² of its
+        acceleration.
+        """
+        self.config.slot1.k_p = kp
+        self.config.slot1.k_i = ki
+        self.config.slot1.k_d = kd
+        self.config.slot1.k_s = ks
+        self.config.slot1.k_v = kv
+        self.config.slot1.k_a = ka
+        self._apply_config(self.config.slot1)
+
+    def set_motion_magic(self, cruise_velocity: float, acceleration: float):
+        """Set the Motion Magic profile's limits, in rotor rotations per
+        second and rotations per second²
+        """
+        self.config.motion_magic.motion_magic_cruise_velocity = cruise_velocity
+        self.config.motion_magic.motion_magic_acceleration = acceleration
+        self._apply_config(self.config.motion_magic)
 
     def stopMotor(self):
         self.set(0)
+
+
+def flush_configs(
+    motors: Iterable[MotorController], timeout: float = 0.1
+) -> list[StatusCode]:
+    """Flush the staged configuration of every `WPI_TalonFX` in `motors`
+    in parallel, so that startup waits for one round-trip instead of one
+    per motor. Other motor controllers are ignored.
+    """
+    talons = [motor for motor in motors if isinstance(motor, WPI_TalonFX)]
+    if not talons:
+        return []
+    with ThreadPoolExecutor(len(talons)) as executor:
+        return list(executor.map(lambda motor: motor.flush_config(timeout), talons))
+
+
+@contextmanager
+def deferred_config(*motors: MotorController, timeout: float = 0.1):
+    """Context manager that stages configuration changes made to any
+    `WPI_TalonFX` in `motors` and flushes them all in parallel on exit.
+    Raises an exception if any motor's changes could not be applied; they
+    stay staged, so the flush can be retried with `flush_configs()`.
+
+    Example:
+    with util.deferred_config(left_motor, right_motor):
+        left_motor.setIdleMode(NeutralModeValue.BRAKE)
+        right_motor.setIdleMode(NeutralModeValue.BRAKE)
+        right_motor.setInverted(True)
+    """
+    talons = [motor for motor in motors if isinstance(motor, WPI_TalonFX)]
+    for motor in talons:
+        motor.defer_config = True
+    try:
+        yield
+    finally:
+        for motor in talons:
+            motor.defer_config = False
+        statuses = flush_configs(talons, timeout)
+    failures = [
+        f"{motor.device_id}: {status.name}"
+        for motor, status in zip(talons, statuses)
+        if status.is_error()
+    ]
+    if failures:
+        raise Exception(f"Failed to apply TalonFX configs ({', '.join(failures)})")
+
+
+MotorSnapshot = namedtuple(
+    "MotorSnapshot", "position velocity supply_current temperature"
+)
+TelemetrySnapshot = namedtuple("TelemetrySnapshot", "timestamp motors")
+
+
+class TalonFXTelemetry:
+    """Status signal cache for several `WPI_TalonFX` motors. All signals
+    are refreshed together by `refresh()`, once per loop, so every value in
+    a snapshot comes from the same moment.
+
+    Position is reported in rotations (latency compensated using velocity),
+    velocity in rotations per second, supply current in amps and
+    temperature in degrees Celsius.
+    """
+
+    def __init__(
+        self,
+        motors: Iterable[WPI_TalonFX],
+        update_frequency: float = 100,
+        slow_update_frequency: float = 10,
+        timeout: float = 0,
+    ):
+        """Arguments:
+        motors -- motors to read, in the order they appear in snapshots
+        update_frequency -- update frequency of position and velocity in Hz
+        slow_update_frequency -- update frequency of supply current and
+            temperature in Hz
+        timeout -- how long `refresh()` may wait for new position and
+            velocity frames. If this is 0, the latest frames are used.
+        """
+        self.motors = list(motors)
+        self.timeout = timeout
+        self._positions = [motor.get_position() for motor in self.motors]
+        self._velocities = [motor.get_velocity() for motor in self.motors]
+        self._currents = [motor.get_supply_current() for motor in self.motors]
+        self._temperatures = [motor.get_device_temp() for motor in self.motors]
+        self._fast_signals = self._positions + self._velocities
+        self._slow_signals = self._currents + self._temperatures
+        self._all_signals = self._fast_signals + self._slow_signals
+        BaseStatusSignal.set_update_frequency_for_all(
+            update_frequency, self._fast_signals
+        )
+        BaseStatusSignal.set_update_frequency_for_all(
+            slow_update_frequency, self._slow_signals
+        )
+        self.snapshot = None
+
+    def refresh(self) -> TelemetrySnapshot:
+        """Refresh every signal and return (and cache) a new snapshot"""
+        if self.timeout == 0:
+            BaseStatusSignal.refresh_all(self._all_signals)
+        else:
+            # waiting on the slow signals would stall the loop until they update
+            BaseStatusSignal.wait_for_all(self.timeout, self._fast_signals)
+            BaseStatusSignal.refresh_all(self._slow_signals)
+        self.snapshot = TelemetrySnapshot(
+            Timer.getFPGATimestamp(),
+            tuple(
+                MotorSnapshot(
+                    BaseStatusSignal.get_latency_compensated_value(position, velocity),
+                    velocity.value,
+                    current.value,
+                    temperature.value,
+                )
+                for position, velocity, current, temperature in zip(
+                    self._positions,
+                    self._velocities,
+                    self._currents,
+                    self._temperatures,
+                )
+            ),
+        )
+        return self.snapshot
+
+
+class TunableBinding:
+    """Calls `apply` whenever one of a component's tunables changes, so that
+    values such as PID gains are only pushed into controllers when they are
+    actually edited. Changes are detected by a networktables listener, which
+    means `update()` does no networktables reads in steady state.
+    """
+
+    def __init__(self, component, names: Iterable[str], apply: Callable[[], None]):
+        """Arguments:
+        component -- object whose tunables have been set up by magicbot
+        names -- attribute names of the tunables to watch
+        apply -- called by `update()` after any of the tunables change
+        """
+        self.apply = apply
+        # apply once on the first update
+        self._dirty = True
+        instance = NetworkTableInstance.getDefault()
+        self._listeners = [
+            instance.addListener(
+                component._tunables[getattr(type(component), name)].getTopic(),
+                EventFlags.kValueAll,
+                self._mark_dirty,
+            )
+            for name in names
+        ]
+
+    def _mark_dirty(self, event):
+        # called on the networktables listener thread
+        self._dirty = True
+
+    def update(self):
+        """Call `apply` if any tunable has changed since the last update"""
+        if self._dirty:
+            self._dirty = False
+            self.apply()
+
+    def close(self):
+        """Stop listening for changes. Only needed outside of a robot
+        program, where a remaining listener would abort the interpreter
+        on exit.
+        """
+        instance = NetworkTableInstance.getDefault()
+        for listener in self._listeners:
+            instance.removeListener(listener)
+        self._listeners = []
+
+
+class SimAHRS(navx.AHRS):
+    """navX on the MXP SPI port whose heading is read straight from its
+    simulated device. The real class copies simulated values on a background
+    thread every 20 ms of wall-clock time, so when the simulation runs
+    faster than real time (as it does in tests) its readings lag far behind.
+    """
+
+    def __init__(self):
+        super().__init__(SPI.Port.kMXP)
+        self._yaw = SimDeviceSim(f"navX-Sensor[{SPI.Port.kMXP.value}]").getDouble("Yaw")
+        self._offset = 0.0
+
+    def getAngle(self) -> float:
+        return self._yaw.get() - self._offset
+
+    def getYaw(self) -> float:
+        return math.remainder(self.getAngle(), 360)
+
+    def getRotation2d(self) -> Rotation2d:
+        return Rotation2d.fromDegrees(-self.getAngle())
+
+    def reset(self):
+        self._offset = self._yaw.get()
+
+    def zeroYaw(self):
+        self.reset()
+
+
+def create_navx() -> navx.AHRS:
+    """Returns a navX on the MXP SPI port, or a `SimAHRS` in simulation"""
+    if RobotBase.isSimulation():
+        return SimAHRS()
+    return navx.AHRS.create_spi()
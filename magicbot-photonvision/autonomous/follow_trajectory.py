@@ -0,0 +1,74 @@
+from magicbot import AutonomousStateMachine, state
+from wpimath.controller import LTVUnicycleController
+
+from components.drivetrain import Drivetrain
+from components.pose_estimator import PoseEstimator
+import config
+
+
+class TrajectoryAuto(AutonomousStateMachine):
+    """Follows the trajectories named in `trajectory_names` one after the
+    other, correcting for drift from the pose estimate with an LTV unicycle
+    controller (which, unlike RAMSETE, still corrects the heading when the
+    trajectory comes to a stop). Trajectories are generated in
+    `createObjects()`, so each loop only samples them.
+
+    The pose estimate is reset to the start of the first trajectory, so the
+    robot must be placed there.
+    """
+
+    drivetrain: Drivetrain
+    pose_estimator: PoseEstimator
+
+    # variables to be injected
+    trajectories: dict
+
+    trajectory_names = ()
+
+    def setup(self):
+        self.controller = LTVUnicycleController(
+            0.02, config.auto_constraints.max_velocity
+        )
+        # looked up now so that a missing path is an error at startup
+        self.queue = [self.trajectories[name] for name in self.trajectory_names]
+
+    def on_enable(self):
+        super().on_enable()
+        self.index = 0
+        # time into `following` at which the current trajectory started
+        self.start_time = 0.0
+
+    @state(first=True)
+    def resetting(self):
+        # the pose estimator applies the reset when it next executes
+        self.pose_estimator.reset_pose(self.queue[0].initialPose())
+        self.next_state("following")
+
+    @state
+    def following(self, state_tm):
+        trajectory = self.queue[self.index]
+        if state_tm - self.start_time > trajectory.totalTime():
+            self.index += 1
+            if self.index == len(self.queue):
+                self.done()
+                return
+            self.start_time += trajectory.totalTime()
+            trajectory = self.queue[self.index]
+
+        goal = trajectory.sample(state_tm - self.start_time)
+        self.drivetrain.drive_speeds(
+            self.controller.calculate(self.pose_estimator.get_pose(), goal)
+        )
+
+
+class LeaveSpeaker(TrajectoryAuto):
+    MODE_NAME = "Leave Speaker"
+    DEFAULT = True
+
+    trajectory_names = ("leave_speaker",)
+
+
+class LeaveAndReturn(TrajectoryAuto):
+    MODE_NAME = "Leave And Return"
+
+    trajectory_names = ("leave_speaker", "return_to_speaker")
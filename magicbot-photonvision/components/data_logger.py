@@ -0,0 +1,101 @@
+import wpilib
+from wpilib import DataLogManager
+from wpiutil.log import BooleanLogEntry, DataLog, DoubleArrayLogEntry, DoubleLogEntry
+import navx
+
+from components.drivetrain import Drivetrain
+from components.vision import Vision
+
+
+class DataLogger:
+    """Records drivetrain commands, motor outputs, the gyro, the joystick,
+    vision data and whether the robot is in teleop to a wpilib `DataLog`
+    every enabled loop, for tuning after a match
+    and for replaying with `replay.py`. `DataLog` buffers records in memory
+    and writes them to disk on its own background thread, so appending never
+    blocks the control loop.
+
+    Entries are created once in `setup()` and the array buffers are reused,
+    so nothing is allocated per loop beyond what `DataLog` itself does.
+    Vision snapshots are only recorded when they change.
+    """
+
+    drivetrain: Drivetrain
+    vision: Vision
+
+    # variables to be injected
+    gyro: navx.AHRS
+    joystick: wpilib.Joystick
+    enabled: bool
+    # button that puts the drive inputs into precision mode
+    precision_button: int
+
+    # the log started by `DataLogManager` is used unless another is given
+    log: DataLog = None
+
+    def setup(self):
+        if not self.enabled:
+            return
+        if self.log is None:
+            DataLogManager.start()
+            self.log = DataLogManager.getLog()
+        self._forward = DoubleLogEntry(self.log, "drivetrain/forward")
+        self._turn = DoubleLogEntry(self.log, "drivetrain/turn")
+        self._motor_outputs_entry = DoubleArrayLogEntry(
+            self.log, "drivetrain/motor_outputs"
+        )
+        self._angle = DoubleLogEntry(self.log, "gyro/angle")
+        self._rate = DoubleLogEntry(self.log, "gyro/rate")
+        self._joystick_x = DoubleLogEntry(self.log, "joystick/x")
+        self._joystick_y = DoubleLogEntry(self.log, "joystick/y")
+        self._joystick_trigger = BooleanLogEntry(self.log, "joystick/trigger")
+        self._joystick_precision = BooleanLogEntry(self.log, "joystick/precision")
+        self._teleop = BooleanLogEntry(self.log, "robot/teleop")
+        # [valid, id, x, y, z, heading, latency, timestamp]
+        self._vision_entry = DoubleArrayLogEntry(self.log, "vision/snapshot")
+
+        self._motors = (
+            self.drivetrain.front_left_motor,
+            self.drivetrain.front_right_motor,
+            self.drivetrain.back_left_motor,
+            self.drivetrain.back_right_motor,
+        )
+        self._motor_outputs = [0.0] * len(self._motors)
+        self._vision = [0.0] * 8
+
+    def execute(self):
+        if not self.enabled:
+            return
+        # runs after the drivetrain, but before its commands are reset
+        self._forward.append(self.drivetrain.forward)
+        self._turn.append(self.drivetrain.turn)
+        outputs = self._motor_outputs
+        # a TalonFX following a velocity request reports the duty cycle it
+        # applies, rather than the last one set
+        for i, motor in enumerate(self._motors):
+            outputs[i] = motor.get()
+        self._motor_outputs_entry.append(outputs)
+
+        self._angle.append(self.gyro.getAngle())
+        self._rate.append(self.gyro.getRate())
+        self._joystick_x.append(self.joystick.getX())
+        self._joystick_y.append(self.joystick.getY())
+        self._joystick_trigger.append(self.joystick.getTrigger())
+        self._joystick_precision.append(
+            self.joystick.getRawButton(self.precision_button)
+        )
+        self._teleop.append(wpilib.DriverStation.isTeleop())
+
+        snapshot = self.vision.getSnapshot()
+        values = self._vision
+        valid = float(snapshot.valid)
+        if snapshot.timestamp != values[7] or valid != values[0]:
+            values[0] = valid
+            values[1] = snapshot.id
+            values[2] = snapshot.x
+            values[3] = snapshot.y
+            values[4] = snapshot.z
+            values[5] = snapshot.heading
+            values[6] = snapshot.latency
+            values[7] = snapshot.timestamp
+            self._vision_entry.append(values)
@@ -1,21 +1,54 @@
 import math
 import numpy as np
 
+from wpilib import Timer
 import wpimath.controller
+from wpimath.interpolation import TimeInterpolatableFloatBuffer
 import magicbot
 from magicbot.state_machine import state
 from magicbot import tunable
+from wpimath.geometry import Transform2d, Translation2d
 import navx
 
 from components.drivetrain import Drivetrain
+from components.pose_estimator import PoseEstimator
 from components.vision import Vision
 import util
 
 
-def adjust_heading(rc: np.array, ct: np.array):
-    """rc -- robot to camera vector
+def adjust_heading(rc: tuple, ct: tuple) -> float:
+    """Returns the angle (in degrees) the robot must turn to face a tag.
+
+    Arguments:
+    rc -- robot to camera vector (2 or 3 elements; a missing z is taken as 0)
     ct -- camera to tag vector
     """
+    rc_x, rc_y = rc[0], rc[1]
+    rc_z = rc[2] if len(rc) > 2 else 0.0
+    rt_x = rc_x + ct[0]
+    rt_y = rc_y + ct[1]
+    rt_z = rc_z + ct[2]
+    cos_theta = (rc_x * rt_x + rc_y * rt_y + rc_z * rt_z) / math.sqrt(
+        (rc_x * rc_x + rc_y * rc_y + rc_z * rc_z)
+        * (rt_x * rt_x + rt_y * rt_y + rt_z * rt_z)
+    )
+    # rounding can push this slightly outside the domain of acos
+    theta = math.degrees(math.acos(max(-1.0, min(cos_theta, 1.0))))
+    # z component of rt x rc
+    d = rt_x * rc_y - rt_y * rc_x
+    if d > 0:
+        return theta
+    elif d < 0:
+        return -theta
+    else:
+        return 0
+
+
+def adjust_heading_numpy(rc: np.array, ct: np.array):
+    """Equivalent to `adjust_heading()` using numpy. Much slower for
+    vectors this small, but kept as a reference for testing.
+    """
+    rc = np.pad(rc, (0, 3 - len(rc)))
     rt = rc + ct
     theta = math.acos(np.dot(rc, rt) / (np.linalg.norm(rc) * np.linalg.norm(rt)))
     theta *= 180 / math.pi
@@ -31,6 +64,7 @@ def adjust_heading(rc: np.array, ct: np.array):
 class DriveControl(magicbot.StateMachine):
     # other components
     drivetrain: Drivetrain
+    pose_estimator: PoseEstimator
     vision: Vision
 
     # variables to be injected
@@ -42,9 +76,12 @@ class DriveControl(magicbot.StateMachine):
     turn_to_angle_tP = tunable(5)
     turn_to_angle_tV = tunable(0.1)
 
-    drive_from_tag_kP = tunable(2)
+    drive_from_tag_kP = tunable(2.0)
     drive_from_tag_setpoint = tunable(0.3)
 
+    # seconds of gyro history kept to match vision frames to robot heading
+    heading_history_length = 1.0
+
     def setup(self):
         # setup() required because tunables need to be fetched
         self.turn_to_angle_controller = wpimath.controller.PIDController(
@@ -54,6 +91,84 @@ class DriveControl(magicbot.StateMachine):
             self.turn_to_angle_tP, self.turn_to_angle_tV
         )
         self.turn_to_angle_controller.enableContinuousInput(0, 360)
+        self.turn_to_angle_tunables = util.TunableBinding(
+            self,
+            (
+                "turn_to_angle_kP",
+                "turn_to_angle_kI",
+                "turn_to_angle_kD",
+                "turn_to_angle_tP",
+                "turn_to_angle_tV",
+            ),
+            self.update_turn_to_angle_controller,
+        )
+        self.drive_from_tag_controller = wpimath.controller.PIDController(
+            self.drive_from_tag_kP, 0, 0
+        )
+        self.drive_from_tag_controller.setSetpoint(self.drive_from_tag_setpoint)
+        self.drive_from_tag_tunables = util.TunableBinding(
+            self,
+            ("drive_from_tag_kP", "drive_from_tag_setpoint"),
+            self.update_drive_from_tag_controller,
+        )
+        self.heading_history = TimeInterpolatableFloatBuffer(
+            self.heading_history_length
+        )
+
+    def update_turn_to_angle_controller(self):
+        """Updates the `turn_to_angle` PID controller with new values
+        from networktables. Only called when one of them has changed.
+        """
+        self.turn_to_angle_controller.setPID(
+            self.turn_to_angle_kP, self.turn_to_angle_kI, self.turn_to_angle_kD
+        )
+        self.turn_to_angle_controller.setTolerance(
+            self.turn_to_angle_tP, self.turn_to_angle_tV
+        )
+
+    def update_drive_from_tag_controller(self):
+        """Updates the `drive_from_tag` P controller with new values from
+        networktables. Only called when one of them has changed.
+        """
+        self.drive_from_tag_controller.setP(self.drive_from_tag_kP)
+        self.drive_from_tag_controller.setSetpoint(self.drive_from_tag_setpoint)
+
+    def get_heading_at(self, timestamp: float) -> float:
+        """Returns the gyro angle at a given FPGA timestamp, interpolating
+        between recorded samples. Falls back to the current angle if
+        `timestamp` is None or no history has been recorded.
+        """
+        if timestamp is not None:
+            heading = self.heading_history.sample(timestamp)
+            if heading is not None:
+                return heading
+        return self.gyro.getAngle()
+
+    def get_camera_to_tag(self) -> Translation2d:
+        """Returns the position of the currently seen tag relative to the
+        camera, computed from the fused field pose rather than the filtered
+        camera outputs. Returns None if the pose has no recent vision fix or
+        the tag isn't in the field layout.
+        """
+        if not self.pose_estimator.has_vision_fix():
+            return None
+        target = self.vision.getSnapshot()
+        if not target.valid:
+            return None
+        # a vision fix means the vision estimator is running
+        tag_pose = self.vision.estimator.tag_poses.get(target.id)
+        if tag_pose is None:
+            return None
+        robot_to_camera = self.vision.robot_to_camera
+        camera_pose = self.pose_estimator.get_pose().transformBy(
+            Transform2d(
+                robot_to_camera.translation().toTranslation2d(),
+                robot_to_camera.rotation().toRotation2d(),
+            )
+        )
+        return (
+            tag_pose.translation().toTranslation2d() - camera_pose.translation()
+        ).rotateBy(-camera_pose.rotation())
 
     def set_angle(self, angle: float):
         """Changes the `turn_to_angle` PID controller's setpoint"""
@@ -72,6 +187,7 @@ class DriveControl(magicbot.StateMachine):
     def set_drive_from_tag(self, distance: float):
         """Changes the `drive_from_tag` P controller's setpoint"""
         self.drive_from_tag_setpoint = distance
+        self.drive_from_tag_controller.setSetpoint(distance)
 
     def drive_from_tag(self, distance: float = None):
         """Call this function to engage the `driving_from_tag` state.
@@ -87,17 +203,17 @@ class DriveControl(magicbot.StateMachine):
         """Changes the `turn_to_angle` setpoint to one such that the robot
         would face an AprilTag
         """
-        if not self.vision.hasTargets():
+        target = self.vision.getSnapshot()
+        if not target.valid:
             return
-        rc = np.array([0.35, 0])
-        ct = np.array([self.vision.getX(), self.vision.getY(), self.vision.getZ()])
-        latency = self.vision.getLatency()
-        turn_rate = self.gyro.getRate()
-        theta = adjust_heading(rc, ct) - latency * turn_rate
+        rc = (0.35, 0)
+        ct = (target.x, target.y, target.z)
         if self.turn_to_angle_controller.atSetpoint():
-            theta = 0
-        if self.vision.hasTargets():
-            self.turn_to_angle(self.gyro.getAngle() + theta)
+            self.turn_to_angle(self.gyro.getAngle())
+        else:
+            # the tag was seen from wherever the robot faced when the frame was captured
+            heading = self.get_heading_at(target.timestamp)
+            self.turn_to_angle(heading + adjust_heading(rc, ct))
 
     def follow_tag(self, distance: float = None):
         """Call this function to engage the `following_tag` state.
@@ -117,9 +233,10 @@ class DriveControl(magicbot.StateMachine):
         """Note the use of `force=True` which is needed to force the state
         machine to switch states upon seeing a different ID
         """
-        if self.vision.getId() == 1:
+        target = self.vision.getSnapshot()
+        if target.valid and target.id == 1:
             self.engage(initial_state="driving_forwards", force=True)
-        elif self.vision.getId() == 2:
+        elif target.valid and target.id == 2:
             self.engage(initial_state="driving_backwards", force=True)
         else:
             self.done()
@@ -146,12 +263,7 @@ class DriveControl(magicbot.StateMachine):
         """State in which robot uses a PID controller to turn to a certain
         angle using sensor data from the gyroscope.
         """
-        self.turn_to_angle_controller.setPID(
-            self.turn_to_angle_kP, self.turn_to_angle_kI, self.turn_to_angle_kD
-        )
-        self.turn_to_angle_controller.setTolerance(
-            self.turn_to_angle_tP, self.turn_to_angle_tV
-        )
+        self.turn_to_angle_tunables.update()
 
         measurement = self.gyro.getAngle()
         output = self.turn_to_angle_controller.calculate(measurement)
@@ -167,9 +279,10 @@ class DriveControl(magicbot.StateMachine):
         """State in which robot drives forward or backward so that it is
         a set distance away from a detected Apriltag
         """
-        measurement = self.vision.getX()
-        error = self.drive_from_tag_setpoint - measurement
-        output = error * self.drive_from_tag_kP
+        self.drive_from_tag_tunables.update()
+
+        measurement = self.vision.getSnapshot().x
+        output = self.drive_from_tag_controller.calculate(measurement)
         self.drivetrain.arcade_drive(util.clamp(output, -0.3, 0.3), 0)
 
     @state
@@ -177,29 +290,41 @@ class DriveControl(magicbot.StateMachine):
         """State in which robot drives so that it both is a set distance
         away from a detected Apriltag and faces the Apriltag. In theory,
         both of these effects combined would make the robot "follow" a tag.
+        Uses the fused pose from `pose_estimator` when it has a vision fix,
+        and the filtered camera outputs otherwise.
         """
-        self.turn_to_angle_controller.setPID(
-            self.turn_to_angle_kP, self.turn_to_angle_kI, self.turn_to_angle_kD
-        )
-        self.turn_to_angle_controller.setTolerance(
-            self.turn_to_angle_tP, self.turn_to_angle_tV
-        )
+        self.turn_to_angle_tunables.update()
+        self.drive_from_tag_tunables.update()
 
-        rc = np.array([0.33, -0.03, 0])
-        ct = np.array([self.vision.getX(), self.vision.getY(), self.vision.getZ()])
-        latency = self.vision.getLatency()
-        turn_rate = self.gyro.getRate()
-        theta = adjust_heading(rc, ct) - latency * turn_rate
+        target = self.vision.getSnapshot()
+        ct = self.get_camera_to_tag()
         if self.turn_to_angle_controller.atSetpoint():
-            theta = 0
-        self.set_angle(self.gyro.getAngle() + theta)
+            self.set_angle(self.gyro.getAngle())
+        elif ct is not None:
+            # the fused pose is current, so no heading history is needed
+            rt = ct.rotateBy(self.vision.robot_to_camera.rotation().toRotation2d())
+            rt += self.vision.robot_to_camera.translation().toTranslation2d()
+            # the gyro angle increases clockwise, unlike wpimath angles
+            self.set_angle(self.gyro.getAngle() - math.degrees(rt.angle().radians()))
+        else:
+            rc = (0.33, -0.03, 0)
+            ct_filtered = (target.x, target.y, target.z)
+            heading = self.get_heading_at(target.timestamp)
+            self.set_angle(heading + adjust_heading(rc, ct_filtered))
         angle_measurement = self.gyro.getAngle()
         turn_output = self.turn_to_angle_controller.calculate(angle_measurement)
 
-        distance_measurement = self.vision.getX()
-        distance_error = self.drive_from_tag_setpoint - distance_measurement
-        forward_output = distance_error * self.drive_from_tag_kP
+        if ct is not None:
+            distance_measurement = ct.X()
+        else:
+            distance_measurement = target.x
+        forward_output = self.drive_from_tag_controller.calculate(distance_measurement)
 
         self.drivetrain.arcade_drive(
             util.clamp(forward_output, -0.3, 0.3), util.clamp(-turn_output, -0.3, 0.3)
         )
+
+    def execute(self):
+        # record heading every loop, whether or not a state is running
+        self.heading_history.addSample(Timer.getFPGATimestamp(), self.gyro.getAngle())
+        super().execute()
@@ -4,8 +4,15 @@ from wpilib.drive import DifferentialDrive
 from magicbot import will_reset_to, tunable
 from rev import CANSparkBase
 from phoenix6.signals import NeutralModeValue
+from wpimath.controller import SimpleMotorFeedforwardMeters
+from wpimath.kinematics import (
+    ChassisSpeeds,
+    DifferentialDriveKinematics,
+    DifferentialDriveWheelSpeeds,
+)
 
 from config import ControllerType
+import util
 
 
 class Drivetrain:
@@ -16,10 +23,25 @@ class Drivetrain:
     back_right_motor: MotorController
 
     controller_type: ControllerType
+    # distance the robot travels per rotation of a drive motor
+    meters_per_rotation: float
+    track_width: float
+    # volts needed to drive each side's wheels at a speed
+    feedforward: SimpleMotorFeedforwardMeters
+    # if True, the wheels are driven at a speed by the TalonFX velocity loop
+    # instead of at a duty cycle (only supported by TalonFX motors)
+    velocity_control: bool
+
+    # volts per rotor rotation per second of velocity error
+    velocity_kP = tunable(0.1)
 
     # values will reset to 0 after every time control loop runs
     forward = will_reset_to(0)
     turn = will_reset_to(0)
+    # if set, overrides `forward` and `turn` for one loop
+    speeds = will_reset_to(None)
+    # seconds between loops, used to work out the acceleration of `speeds`
+    period = 0.02
 
     def setup(self):
         """Called after `createObjects()` has been called in the main robot class
@@ -34,11 +56,38 @@ class Drivetrain:
         self.right_motor_controller_group = wpilib.MotorControllerGroup(
             self.front_right_motor, self.back_right_motor
         )
+        # the right side is inverted by its motor controller group, not the
+        # motors, so it is negated wherever the motors are used directly
         self.right_motor_controller_group.setInverted(True)
         self.drive = DifferentialDrive(
             self.left_motor_controller_group, self.right_motor_controller_group
         )
         self.drive.setExpiration(0.1)
+        self.kinematics = DifferentialDriveKinematics(self.track_width)
+        self._wheel_speeds = None
+        # arcade inputs are scaled to the speed reached at a nominal 12 volts
+        self.max_speed = self.feedforward.maxAchievableVelocity(12, 0)
+        if self.velocity_control:
+            if self.controller_type != ControllerType.TALON_FX:
+                raise Exception("velocity control requires TalonFX motors")
+            self.velocity_tunables = util.TunableBinding(
+                self, ("velocity_kP",), self.update_velocity_gains
+            )
+            # the first update applies the gains, before the robot is enabled
+            self.velocity_tunables.update()
+
+        # sensor data can only be read in bulk from phoenix6 motors
+        if self.controller_type == ControllerType.TALON_FX:
+            self.telemetry = util.TalonFXTelemetry(
+                (
+                    self.front_left_motor,
+                    self.front_right_motor,
+                    self.back_left_motor,
+                    self.back_right_motor,
+                )
+            )
+        else:
+            self.telemetry = None
 
     def on_enable(self):
         """Called when robot enters autonomous or teleoperated mode"""
@@ -54,9 +103,112 @@ class Drivetrain:
         self.forward = forward
         self.turn = turn
 
+    def drive_speeds(self, speeds: ChassisSpeeds):
+        """Makes the robot drive at a velocity in m/s and rad/s, using the
+        feedforward to work out the voltage each side needs
+        """
+        self.speeds = speeds
+
+    def update_gains(self):
+        """Sends any gains edited since the last update to the motors.
+        Configs block while they are applied, so this is called while the
+        robot is disabled rather than from `execute()`.
+        """
+        if self.velocity_control:
+            self.velocity_tunables.update()
+
+    def update_velocity_gains(self):
+        """Sends `velocity_kP` to each motor's velocity loop, applying the
+        configs of all four motors in parallel
+        """
+        motors = (
+            self.front_left_motor,
+            self.front_right_motor,
+            self.back_left_motor,
+            self.back_right_motor,
+        )
+        with util.deferred_config(*motors):
+            for motor in motors:
+                motor.set_velocity_gains(self.velocity_kP)
+
     def stop(self):
+        """Clears the commands, which is also what magicbot's reset of the
+        `will_reset_to` variables does after every loop
+        """
         self.forward = 0
         self.turn = 0
+        self.speeds = None
+
+    def get_telemetry(self) -> util.TelemetrySnapshot:
+        """Returns the motor readings taken during the last `execute()`,
+        in the order front left, front right, back left, back right.
+        Returns None if the motors do not support this or no readings have
+        been taken yet.
+        """
+        if self.telemetry is None:
+            return None
+        return self.telemetry.snapshot
+
+    def get_wheel_positions(self) -> tuple[float, float]:
+        """Returns the distance in meters traveled by the left and right
+        wheels, as of the last `execute()`. Returns None if motor readings
+        are not available (see `get_telemetry()`).
+        """
+        telemetry = self.get_telemetry()
+        if telemetry is None:
+            return None
+        front_left, front_right, back_left, back_right = telemetry.motors
+        left = (front_left.position + back_left.position) / 2
+        # negated, see `setup()`
+        right = -(front_right.position + back_right.position) / 2
+        return (left * self.meters_per_rotation, right * self.meters_per_rotation)
 
     def execute(self):
-        self.drive.arcadeDrive(self.forward, self.turn)
+        if self.telemetry is not None:
+            self.telemetry.refresh()
+        if self.speeds is not None:
+            wheel_speeds = self.kinematics.toWheelSpeeds(self.speeds)
+            last = self._wheel_speeds
+        elif self.velocity_control:
+            # joystick steps would need an impossible acceleration, so arcade
+            # inputs only use the velocity part of the feedforward
+            arcade = DifferentialDrive.arcadeDriveIK(self.forward, self.turn, True)
+            wheel_speeds = DifferentialDriveWheelSpeeds(
+                arcade.left * self.max_speed, arcade.right * self.max_speed
+            )
+            last = None
+        else:
+            self._wheel_speeds = None
+            self.drive.arcadeDrive(self.forward, self.turn)
+            return
+
+        if last is None:
+            last = wheel_speeds
+        self._wheel_speeds = wheel_speeds
+        left = self.feedforward.calculate(last.left, wheel_speeds.left, self.period)
+        right = self.feedforward.calculate(last.right, wheel_speeds.right, self.period)
+        if self.velocity_control:
+            self.set_velocities(wheel_speeds, left, right)
+        else:
+            # scaled by the battery voltage, as `MotorController.setVoltage()` does
+            voltage = wpilib.RobotController.getBatteryVoltage()
+            self.drive.tankDrive(left / voltage, right / voltage, squareInputs=False)
+
+    def set_velocities(
+        self, wheel_speeds: DifferentialDriveWheelSpeeds, left: float, right: float
+    ):
+        """Runs each side's velocity loop with a feedforward
+
+        Arguments:
+        wheel_speeds -- target speed of each side in m/s
+        left, right -- feedforward voltage of each side
+        """
+        left_velocity = wheel_speeds.left / self.meters_per_rotation
+        right_velocity = wheel_speeds.right / self.meters_per_rotation
+        self.front_left_motor.set_velocity(left_velocity, left)
+        self.back_left_motor.set_velocity(left_velocity, left)
+        # negated, see `setup()`
+        self.front_right_motor.set_velocity(-right_velocity, -right)
+        self.back_right_motor.set_velocity(-right_velocity, -right)
+        # the motors are set directly, so tell the motor safety they were updated
+        self.drive.feed()
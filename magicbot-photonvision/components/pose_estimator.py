@@ -0,0 +1,95 @@
+from wpilib import Timer
+from wpimath.estimator import DifferentialDrivePoseEstimator
+from wpimath.geometry import Pose2d
+from wpimath.kinematics import DifferentialDriveKinematics
+import navx
+
+from components.drivetrain import Drivetrain
+from components.vision import Vision
+
+
+class PoseEstimator:
+    """Tracks the robot's pose on the field by fusing wheel odometry and the
+    gyro with timestamped pose estimates from `Vision`, using wpimath's
+    Kalman-filtered `DifferentialDrivePoseEstimator`. Vision measurements are
+    applied at the time their frame was captured, so camera latency doesn't
+    lag the pose. The pose is updated once per loop and cached.
+
+    Wheel distances are only available from TalonFX drivetrains; with other
+    motor controllers the pose is never updated.
+    """
+
+    drivetrain: Drivetrain
+    vision: Vision
+
+    # variables to be injected
+    gyro: navx.AHRS
+    track_width: float
+
+    # standard deviations of the odometry (x and y in meters, heading in radians)
+    state_std_devs = (0.02, 0.02, 0.01)
+    # standard deviations of vision measurements without their own; every
+    # `PoseEstimate` from `Vision` carries its own, scaled by tag distance
+    vision_std_devs = (0.1, 0.1, 0.2)
+    # the pose is only trusted as field-relative this long after a vision update
+    vision_timeout = 2.0
+
+    def setup(self):
+        self.kinematics = DifferentialDriveKinematics(self.track_width)
+        # created on the first loop, once wheel distances are available
+        self.estimator = None
+        self.pose = Pose2d()
+        self._reset_pose = None
+        # capture time of the last vision measurement fused since a reset
+        self._vision_timestamp = None
+        # capture time of the last estimate read from `Vision`, which is kept
+        # across resets so that an old estimate isn't fused again
+        self._estimate_timestamp = None
+
+    def get_pose(self) -> Pose2d:
+        """Returns the robot's field pose as of the last `execute()`"""
+        return self.pose
+
+    def has_vision_fix(self) -> bool:
+        """Returns True if a vision measurement has been fused recently enough
+        for `get_pose()` to be trusted relative to the field
+        """
+        return (
+            self._vision_timestamp is not None
+            and Timer.getFPGATimestamp() - self._vision_timestamp < self.vision_timeout
+        )
+
+    def reset_pose(self, pose: Pose2d = Pose2d()):
+        """Moves the tracked pose to `pose` on the next `execute()`"""
+        self._reset_pose = pose
+
+    def execute(self):
+        positions = self.drivetrain.get_wheel_positions()
+        if positions is None:
+            return
+        left, right = positions
+        rotation = self.gyro.getRotation2d()
+        if self.estimator is None:
+            self.estimator = DifferentialDrivePoseEstimator(
+                self.kinematics,
+                rotation,
+                left,
+                right,
+                Pose2d(),
+                self.state_std_devs,
+                self.vision_std_devs,
+            )
+        if self._reset_pose is not None:
+            self.estimator.resetPosition(rotation, left, right, self._reset_pose)
+            self._reset_pose = None
+            self._vision_timestamp = None
+        self.estimator.update(rotation, left, right)
+
+        estimate = self.vision.getPoseEstimate()
+        if estimate is not None and estimate.timestamp != self._estimate_timestamp:
+            self.estimator.addVisionMeasurement(
+                estimate.pose, estimate.timestamp, estimate.std_devs
+            )
+            self._vision_timestamp = estimate.timestamp
+            self._estimate_timestamp = estimate.timestamp
+        self.pose = self.estimator.getEstimatedPosition()
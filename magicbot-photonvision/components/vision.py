@@ -1,19 +1,149 @@
 import math
+from collections import namedtuple
 
+from ntcore import NetworkTableInstance, EventFlags
+from wpilib import Timer
 from photonlibpy.photonCamera import PhotonCamera
+from photonlibpy.photonPipelineResult import PhotonPipelineResult
+from robotpy_apriltag import AprilTagFieldLayout
 from wpimath.filter import MedianFilter
+from wpimath.geometry import Pose2d, Pose3d, Rotation2d, Transform3d
+
+
+# data used from a single camera frame
+Frame = namedtuple("Frame", "timestamp has_targets id latency x y z pose_estimate")
+"""A field-relative robot pose computed from one camera frame.
+`std_devs` is a tuple of (x, y, heading) standard deviations in meters and
+radians, suitable for passing to a wpimath pose estimator.
+"""
+PoseEstimate = namedtuple("PoseEstimate", "pose timestamp ambiguity std_devs tag_count")
+
+
+class TagPoseEstimator:
+    """Computes the robot's field pose from every AprilTag visible in a
+    frame. If PhotonVision has already solved a multi-tag pose on the
+    coprocessor, that is used; otherwise an estimate is made from each tag
+    and the estimates are averaged, weighted by their ambiguity.
+    """
+
+    def __init__(
+        self,
+        field_layout: AprilTagFieldLayout,
+        robot_to_camera: Transform3d,
+        max_ambiguity: float = 0.2,
+        base_std_devs: tuple[float, float, float] = (0.1, 0.1, 0.2),
+    ):
+        """Arguments:
+        field_layout -- poses of all AprilTags on the field
+        robot_to_camera -- position of the camera on the robot
+        max_ambiguity -- single-tag estimates more ambiguous than this are ignored
+        base_std_devs -- standard deviations of a single tag seen from 1 meter
+        """
+        # looked up for every target, so index by fiducial ID once here
+        self.tag_poses = {tag.ID: tag.pose for tag in field_layout.getTags()}
+        self.camera_to_robot = robot_to_camera.inverse()
+        self.max_ambiguity = max_ambiguity
+        self.base_std_devs = base_std_devs
+
+    def _std_devs(self, distance: float, tag_count: int) -> tuple[float, float, float]:
+        # error grows with the square of distance and shrinks with more tags
+        scale = (1 + distance**2) / tag_count
+        return tuple(std_dev * scale for std_dev in self.base_std_devs)
+
+    def estimate(self, result: PhotonPipelineResult) -> PoseEstimate:
+        """Returns a `PoseEstimate`, or None if no known tags are visible"""
+        targets = [
+            target
+            for target in result.getTargets()
+            if target.getFiducialId() in self.tag_poses
+        ]
+        if not targets:
+            return None
+        distance = sum(
+            target.getBestCameraToTarget().translation().norm() for target in targets
+        ) / len(targets)
+
+        multi_tag = result.multiTagResult.estimatedPose
+        if multi_tag.isPresent and len(targets) > 1:
+            pose = (
+                Pose3d().transformBy(multi_tag.best).transformBy(self.camera_to_robot)
+            )
+            return PoseEstimate(
+                pose.toPose2d(),
+                result.getTimestamp(),
+                multi_tag.ambiguity,
+                self._std_devs(distance, len(targets)),
+                len(targets),
+            )
+
+        x = y = cos = sin = total_weight = ambiguity = 0.0
+        used = 0
+        for target in targets:
+            target_ambiguity = target.getPoseAmbiguity()
+            if not 0 <= target_ambiguity <= self.max_ambiguity:
+                continue
+            pose = (
+                self.tag_poses[target.getFiducialId()]
+                .transformBy(target.getBestCameraToTarget().inverse())
+                .transformBy(self.camera_to_robot)
+                .toPose2d()
+            )
+            weight = 1 / (target_ambiguity + 0.01)
+            x += pose.X() * weight
+            y += pose.Y() * weight
+            cos += pose.rotation().cos() * weight
+            sin += pose.rotation().sin() * weight
+            ambiguity += target_ambiguity * weight
+            total_weight += weight
+            used += 1
+        if used == 0:
+            return None
+        return PoseEstimate(
+            Pose2d(x / total_weight, y / total_weight, Rotation2d(cos, sin)),
+            result.getTimestamp(),
+            ambiguity / total_weight,
+            self._std_devs(distance, used),
+            used,
+        )
+
+
+class VisionSnapshot:
+    """Target data from `Vision`, updated in place once per loop so that
+    every field comes from the same frame. `valid` is False when no target
+    has been seen recently, in which case the other target fields hold
+    their last values and should not be used.
+    """
+
+    __slots__ = ("valid", "id", "x", "y", "z", "heading", "latency", "timestamp")
+
+    def __init__(self):
+        self.valid = False
+        self.id = 0
+        self.x = 0.0
+        self.y = 0.0
+        self.z = 0.0
+        self.heading = 0.0
+        self.latency = 0.0
+        # capture time of the last frame (with or without targets), or -1
+        self.timestamp = -1.0
 
 
 class Vision:
     camera: PhotonCamera
     # size of filter window: larger values are less accurate but better at filtering
     filter_window: int
+    """If True, camera results are read and reduced on a networktables
+    listener thread as they arrive, and `execute()` only picks up the latest
+    frame. Otherwise, `execute()` reads the camera itself.
+    """
+    background_ingest: bool
+    # if True, the robot's field pose is estimated from all visible tags
+    estimate_pose: bool
+    field_layout: AprilTagFieldLayout
+    robot_to_camera: Transform3d
 
-    _x = 0
-    _y = 0
-    _z = 0
-    _id = 0
-    _latency = 0
+    # if no new frame arrives for this many seconds, targets are considered lost
+    max_frame_age = 0.5
 
     def setup(self):
         # setup() required because variables need to be injected
@@ -21,59 +151,145 @@ class Vision:
         self._y_filter = MedianFilter(self.filter_window)
         self._z_filter = MedianFilter(self.filter_window)
 
-        """If no targets are found within a certain window of time, 
-        this component will consider there to be no targets. 
-        This is to prevent momentary lapses in detection from 
+        """If no targets are found within a certain number of frames,
+        this component will consider there to be no targets.
+        This is to prevent momentary lapses in detection from
         causing the robot to jerk
         """
         self.drought = self.filter_window
+        self.snapshot = VisionSnapshot()
+
+        self.estimator = None
+        if self.estimate_pose:
+            self.estimator = TagPoseEstimator(self.field_layout, self.robot_to_camera)
+        self._pose_estimate = None
+
+        # results without data have a timestamp of -1
+        self._frame_timestamp = -1
+        # number of distinct frames received from the camera
+        self.sequence = 0
+
+        # written by the listener thread, read by `execute()`
+        self._latest_frame = None
+        if self.background_ingest:
+            self._listener = NetworkTableInstance.getDefault().addListener(
+                NetworkTableInstance.getDefault().getTopic(
+                    f"/photonvision/{self.camera.getName()}/rawBytes"
+                ),
+                EventFlags.kValueAll,
+                self._ingest,
+            )
+
+    def getSnapshot(self) -> VisionSnapshot:
+        """Returns the target data as of the last `execute()`. The same
+        object is returned every time and updated in place, so copy any
+        fields that need to outlive the current loop.
+        """
+        return self.snapshot
 
     def hasTargets(self) -> bool:
-        return self.drought < self.filter_window
+        return self.snapshot.valid
 
     def getX(self) -> float:
-        if self.drought < self.filter_window:
-            return self._x
-        return None
+        return self.snapshot.x if self.snapshot.valid else None
 
     def getY(self) -> float:
-        if self.drought < self.filter_window:
-            return self._y
-        return None
+        return self.snapshot.y if self.snapshot.valid else None
 
     def getZ(self) -> float:
-        if self.drought < self.filter_window:
-            return self._z
-        return None
+        return self.snapshot.z if self.snapshot.valid else None
 
     def getId(self) -> int:
-        if self.drought < self.filter_window:
-            return self._id
-        return None
+        return self.snapshot.id if self.snapshot.valid else None
 
     def getLatency(self) -> float:
-        if self.drought < self.filter_window:
-            return self._latency
-        return None
+        return self.snapshot.latency if self.snapshot.valid else None
+
+    def getTimestamp(self) -> float:
+        """Returns the time (in seconds) at which the last frame was captured,
+        or None if no frame has been received
+        """
+        if self._frame_timestamp < 0:
+            return None
+        return self._frame_timestamp
+
+    def getFrameAge(self) -> float:
+        """Returns the time in seconds since the last frame was captured"""
+        if self._frame_timestamp < 0:
+            return math.inf
+        return Timer.getFPGATimestamp() - self._frame_timestamp
+
+    def getPoseEstimate(self) -> PoseEstimate:
+        """Returns the field pose estimated from the most recent frame in
+        which known tags were visible, or None if there has been none. Check
+        its timestamp to tell whether it is new.
+        """
+        return self._pose_estimate
 
     # returns angle that robot must turn to face tag
     def getHeading(self) -> float:
-        if self.drought < self.filter_window:
-            return math.atan2(-self._y, self._x) * 180 / math.pi
-        return None
+        return self.snapshot.heading if self.snapshot.valid else None
 
-    def execute(self):
+    def _read_frame(self, result: PhotonPipelineResult) -> Frame:
+        if not result.hasTargets():
+            return Frame(
+                result.getTimestamp(), False, None, None, None, None, None, None
+            )
+        """replace this garbage with `result.getBestTarget()` whenever
+        photonvision decides to implement it in their lovely library"""
+        target = min(result.getTargets(), key=lambda t: t.getPoseAmbiguity())
+        transform = target.getBestCameraToTarget()
+        return Frame(
+            result.getTimestamp(),
+            True,
+            target.getFiducialId(),
+            result.getLatencyMillis() / 1000,
+            transform.X(),
+            transform.Y(),
+            transform.Z(),
+            None if self.estimator is None else self.estimator.estimate(result),
+        )
+
+    def _ingest(self, event):
+        """Called on the networktables listener thread for every new result"""
         result = self.camera.getLatestResult()
-        if result.hasTargets():
-            self.drought = 0
-            """replace this garbage with `result.getBestTarget()` whenever
-            photonvision decides to implement it in their lovely library"""
-            target = min(result.getTargets(), key=lambda t: t.getPoseAmbiguity())
-            transform = target.getBestCameraToTarget()
-            self._id = target.getFiducialId()
-            self._latency = result.getLatencyMillis() / 1000
-            self._x = self._x_filter.calculate(transform.X())
-            self._y = self._y_filter.calculate(transform.Y())
-            self._z = self._z_filter.calculate(transform.Z())
+        latest = self._latest_frame
+        if latest is None or result.getTimestamp() != latest.timestamp:
+            # a single reference assignment, so `execute()` never sees half a frame
+            self._latest_frame = self._read_frame(result)
+
+    def execute(self):
+        if self.background_ingest:
+            frame = self._latest_frame
         else:
-            self.drought += 1
+            result = self.camera.getLatestResult()
+            # the camera usually runs slower than the robot loop, so results
+            # are only read when they are new
+            if result.getTimestamp() == self._frame_timestamp:
+                frame = None
+            else:
+                frame = self._read_frame(result)
+
+        snapshot = self.snapshot
+        if frame is None or frame.timestamp == self._frame_timestamp:
+            if self.getFrameAge() > self.max_frame_age:
+                self.drought = self.filter_window
+        else:
+            self._frame_timestamp = frame.timestamp
+            self.sequence += 1
+            snapshot.timestamp = frame.timestamp
+
+            if frame.has_targets:
+                self.drought = 0
+                snapshot.id = frame.id
+                snapshot.latency = frame.latency
+                snapshot.x = self._x_filter.calculate(frame.x)
+                snapshot.y = self._y_filter.calculate(frame.y)
+                snapshot.z = self._z_filter.calculate(frame.z)
+                # angle that robot must turn to face tag
+                snapshot.heading = math.degrees(math.atan2(-snapshot.y, snapshot.x))
+                if frame.pose_estimate is not None:
+                    self._pose_estimate = frame.pose_estimate
+            else:
+                self.drought += 1
+        snapshot.valid = self.drought < self.filter_window
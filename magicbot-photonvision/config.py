@@ -9,9 +9,13 @@ class ControllerType(Enum):
 
 
 # Configuration objects will be injected into component classes
+# (`wheel_diameter` and `track_width` are in meters, `gear_ratio` is motor
+# rotations per wheel rotation, and `ks`, `kv` and `ka` are the feedforward
+# gains of each side in volts, volts per m/s and volts per m/s²)
 DrivetrainConfig = namedtuple(
     "DrivetrainConfig",
-    "front_left_id front_right_id back_left_id back_right_id controller_type",
+    "front_left_id front_right_id back_left_id back_right_id controller_type "
+    "wheel_diameter gear_ratio track_width ks kv ka",
 )
 pandemonium_cfg = DrivetrainConfig(
     front_left_id=15,
@@ -19,6 +23,12 @@ pandemonium_cfg = DrivetrainConfig(
     back_left_id=55,
     back_right_id=12,
     controller_type=ControllerType.TALON_SRX,
+    wheel_diameter=0.1524,
+    gear_ratio=10.71,
+    track_width=0.56,
+    ks=0.15,
+    kv=3.0,
+    ka=0.6,
 )
 pancake_cfg = DrivetrainConfig(
     front_left_id=8,
@@ -26,4 +36,21 @@ pancake_cfg = DrivetrainConfig(
     back_left_id=7,
     back_right_id=11,
     controller_type=ControllerType.TALON_FX,
+    wheel_diameter=0.1524,
+    gear_ratio=10.71,
+    track_width=0.56,
+    ks=0.15,
+    kv=2.5,
+    ka=0.4,
+)
+
+# Limits for generating autonomous trajectories (`max_velocity` in m/s,
+# `max_acceleration` in m/s², `max_voltage` is the most the feedforward may use)
+TrajectoryConstraints = namedtuple(
+    "TrajectoryConstraints", "max_velocity max_acceleration max_voltage"
+)
+auto_constraints = TrajectoryConstraints(
+    max_velocity=2.0,
+    max_acceleration=1.5,
+    max_voltage=10.0,
 )
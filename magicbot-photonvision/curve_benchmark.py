@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Times the curves in `util.py`, so the compiled lookup tables can be
+compared to the closures they replace, and the numpy array path to calling
+a curve on each input. Kept out of the test suite, since
+timings depend on the machine and its load.
+
+Usage: python curve_benchmark.py [--repeat N]
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+import util
+
+
+curves = {
+    "linear": util.linear_curve,
+    "ollie": util.ollie_curve,
+    "cubic": util.cubic_curve,
+}
+
+
+def sample_inputs(n: int = 1000) -> list[float]:
+    return [-1.2 + 2.4 * i / (n - 1) for i in range(n)]
+
+
+def time_per_call(f, inputs: list[float], repeat: int) -> float:
+    """Returns the fastest time in seconds for one call of `f`"""
+    elapsed = min(
+        timeit.repeat(lambda: [f(x) for x in inputs], number=20, repeat=repeat)
+    )
+    return elapsed / (20 * len(inputs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = sample_inputs()
+    print("curve   closure (ns)  compiled (ns)  speedup")
+    for name, make_curve in curves.items():
+        exact = make_curve(scalar=0.5, deadband=0.1, max_mag=1)
+        compiled = make_curve(scalar=0.5, deadband=0.1, max_mag=1, compiled=True)
+        exact_time = time_per_call(exact, inputs, args.repeat)
+        compiled_time = time_per_call(compiled, inputs, args.repeat)
+        print(
+            f"{name:6}  {exact_time * 1e9:12.0f}  {compiled_time * 1e9:13.0f}  "
+            f"{exact_time / compiled_time:7.2f}"
+        )
+
+    # one match of inputs at 50 Hz
+    f = util.cubic_curve(scalar=0.5, deadband=0.1, max_mag=1)
+    inputs = np.random.default_rng(0).uniform(-1, 1, 150 * 50)
+    array_time = min(
+        timeit.repeat(lambda: f.array(inputs), number=1, repeat=args.repeat)
+    )
+    scalar_time = min(
+        timeit.repeat(lambda: [f(x) for x in inputs], number=1, repeat=args.repeat)
+    )
+    print(
+        f"array path: {array_time * 1000:.2f} ms for one match of inputs, "
+        f"{scalar_time / array_time:.0f}x faster than calling the curve"
+    )
+
+
+if __name__ == "__main__":
+    main()
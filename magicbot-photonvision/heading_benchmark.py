@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Times `adjust_heading()` in `components/drive_control.py` against the
+numpy implementation it replaced, for the camera offsets the robot passes
+it. Kept out of the test suite, since timings depend on the machine and its
+load.
+
+Usage: python heading_benchmark.py [--repeat N]
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from components.drive_control import adjust_heading, adjust_heading_numpy
+
+
+# (robot to camera, camera to tag) as passed by `following_tag`, and with the
+# 2D robot to camera offset that `turn_to_tag` passes
+cases = {
+    "3d": ((0.33, -0.03, 0), (1.5, 0.4, 0.2)),
+    "2d": ((0.33, -0.03), (1.5, 0.4, 0.2)),
+}
+
+
+def time_per_call(f, repeat: int, number: int = 10000) -> float:
+    """Returns the fastest time in seconds for one call of `f`"""
+    return min(timeit.repeat(f, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("case  scalar (us)  numpy (us)  speedup")
+    for name, (rc, ct) in cases.items():
+        rc_array = np.array(rc)
+        ct_array = np.array(ct)
+        scalar = time_per_call(lambda: adjust_heading(rc, ct), args.repeat)
+        vector = time_per_call(
+            lambda: adjust_heading_numpy(rc_array, ct_array), args.repeat
+        )
+        print(
+            f"{name:4}  {scalar * 1e6:11.2f}  {vector * 1e6:10.2f}  "
+            f"{vector / scalar:7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
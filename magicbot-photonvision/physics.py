@@ -0,0 +1,242 @@
+"""Physics model used when the robot is simulated. pyfrc calls `update_sim()`
+once per robot loop on the simulated clock, so in tests a whole match runs
+as fast as the CPU allows.
+"""
+
+import math
+import struct
+
+import wpilib
+from ntcore import NetworkTableInstance
+from photonlibpy.version import PHOTONVISION_VERSION
+from pyfrc.physics.core import PhysicsInterface
+from robotpy_apriltag import AprilTagFieldLayout
+from wpilib.simulation import DifferentialDrivetrainSim, SimDeviceSim
+from wpimath.geometry import Pose2d, Pose3d, Transform3d
+from phoenix6.controls.velocity_voltage import VelocityVoltage
+from phoenix6.controls.voltage_out import VoltageOut
+from wpimath.system.plant import DCMotor
+
+from config import ControllerType
+from robot import drivetrain_cfg
+import trajectories
+
+
+drive_motors = {
+    ControllerType.SPARK_MAX: DCMotor.NEO(2),
+    ControllerType.TALON_FX: DCMotor.falcon500(2),
+    ControllerType.TALON_SRX: DCMotor.CIM(2),
+}
+
+
+def encode_result(latency: float, targets: list[tuple[int, Transform3d]]) -> bytes:
+    """Returns a PhotonVision pipeline result packet, as decoded by
+    photonlibpy, for a list of (fiducial ID, camera to tag) targets
+
+    Arguments:
+    latency -- time in seconds between the frame's capture and publication
+    """
+    packet = [struct.pack(">db", latency * 1000, len(targets))]
+    for id, camera_to_tag in targets:
+        translation = camera_to_tag.translation()
+        quaternion = camera_to_tag.rotation().getQuaternion()
+        transform = struct.pack(
+            ">7d",
+            translation.X(),
+            translation.Y(),
+            translation.Z(),
+            quaternion.W(),
+            quaternion.X(),
+            quaternion.Y(),
+            quaternion.Z(),
+        )
+        yaw = -math.degrees(math.atan2(translation.Y(), translation.X()))
+        pitch = math.degrees(math.atan2(translation.Z(), translation.X()))
+        packet.append(struct.pack(">4dl", yaw, pitch, 0, 0, id))
+        # best and alternate transforms, then an ambiguity of 0
+        packet.append(transform * 2)
+        # no corners are simulated
+        packet.append(struct.pack(">d8db", 0, *([0] * 8), 0))
+    # no multi-tag result
+    packet.append(struct.pack(">b32h", 0, *([-1] * 32)))
+    return b"".join(packet)
+
+
+def motor_voltage(motor, velocity: float, battery: float) -> float:
+    """Returns the voltage a motor controller applies to its motor. The
+    phoenix6 simulation runs requests in real time, so the TalonFX velocity
+    loop is emulated here with its slot 0 gain to keep the physics
+    deterministic when it runs faster than real time. Its sensors lag behind
+    for the same reason, so code run against the uncapped physics reads
+    wheel positions from the physics instead.
+
+    Arguments:
+    velocity -- rotor velocity in rotations per second
+    battery -- battery voltage
+    """
+    request = getattr(motor, "request", None)
+    if isinstance(request, VelocityVoltage):
+        kp = motor.config.slot0.k_p
+        volts = request.feed_forward + kp * (request.velocity - velocity)
+        return max(-battery, min(volts, battery))
+    if isinstance(request, VoltageOut):
+        return request.output
+    return motor.get() * battery
+
+
+class SimCamera:
+    """Publishes the AprilTags a PhotonVision camera on the simulated robot
+    would see, in the same networktables format as a real coprocessor.
+    Only the fronts of tags within range and the field of view are seen.
+    """
+
+    fov = math.radians(70)
+    max_distance = 5.0
+    frame_period = 1 / 30
+    latency = 0.03
+
+    def __init__(
+        self,
+        name: str,
+        robot_to_camera: Transform3d,
+        field_layout: AprilTagFieldLayout,
+    ):
+        self.robot_to_camera = robot_to_camera
+        self.tags = [(tag.ID, tag.pose) for tag in field_layout.getTags()]
+        root = NetworkTableInstance.getDefault().getTable("photonvision")
+        table = root.getSubTable(name)
+        self.raw_bytes = table.getRawTopic("rawBytes").publish("rawBytes")
+        self.heartbeat = table.getIntegerTopic("heartbeat").publish()
+        self.version = root.getStringTopic("version").publish()
+        self.version.set(PHOTONVISION_VERSION)
+        self.frames = 0
+        self.next_frame = 0.0
+
+    def get_targets(self, robot_pose: Pose2d) -> list[tuple[int, Transform3d]]:
+        """Returns the (fiducial ID, camera to tag) of every visible tag"""
+        camera_pose = Pose3d(robot_pose).transformBy(self.robot_to_camera)
+        camera = camera_pose.translation()
+        targets = []
+        for id, tag_pose in self.tags:
+            camera_to_tag = Transform3d(camera_pose, tag_pose)
+            translation = camera_to_tag.translation()
+            if translation.X() <= 0 or translation.norm() > self.max_distance:
+                continue
+            if abs(math.atan2(translation.Y(), translation.X())) > self.fov / 2:
+                continue
+            # tags face along their x axis
+            facing = tag_pose.rotation().toRotation2d()
+            to_camera = camera - tag_pose.translation()
+            if facing.cos() * to_camera.X() + facing.sin() * to_camera.Y() <= 0:
+                continue
+            targets.append((id, camera_to_tag))
+        return targets
+
+    def update(self, now: float, robot_pose: Pose2d):
+        if now < self.next_frame:
+            return
+        # keep a steady frame rate even though loops don't line up with it
+        self.next_frame = max(self.next_frame + self.frame_period, now)
+        self.frames += 1
+        self.raw_bytes.set(encode_result(self.latency, self.get_targets(robot_pose)))
+        self.heartbeat.set(self.frames)
+
+
+class PhysicsEngine:
+    """Simulates the drivetrain from the configured wheel size, gearing and
+    track width, driven by the motor controllers' outputs. The navX's heading
+    is set from the drivetrain's, TalonFX rotor positions and velocities are
+    fed back so their sensors read correctly, and the camera publishes the
+    AprilTags it would see from the simulated pose.
+    """
+
+    # where the autonomous paths start, facing the tags on the speaker
+    start_pose = trajectories.speaker_pose
+    # kitbot moment of inertia and mass
+    moment_of_inertia = 7.5
+    mass = 27.0
+
+    def __init__(self, physics_controller: PhysicsInterface, robot):
+        self.physics_controller = physics_controller
+        # the back motors are always given the same output as the front ones
+        self.left_motor = robot.drivetrain_front_left_motor
+        self.right_motor = robot.drivetrain_front_right_motor
+        self.drivetrain = DifferentialDrivetrainSim(
+            drive_motors[drivetrain_cfg.controller_type],
+            drivetrain_cfg.gear_ratio,
+            self.moment_of_inertia,
+            self.mass,
+            drivetrain_cfg.wheel_diameter / 2,
+            drivetrain_cfg.track_width,
+        )
+        self.drivetrain.setPose(self.start_pose)
+
+        self.gyro_yaw = SimDeviceSim("navX-Sensor[4]").getDouble("Yaw")
+        self.gyro_yaw.set(0)
+        self.heading = self.start_pose.rotation().degrees()
+        self.start_heading = self.heading
+
+        self.camera = SimCamera(
+            robot.camera.getName(),
+            robot.vision_robot_to_camera,
+            robot.vision_field_layout,
+        )
+
+        if drivetrain_cfg.controller_type == ControllerType.TALON_FX:
+            self.left_talons = (
+                robot.drivetrain_front_left_motor.sim_state,
+                robot.drivetrain_back_left_motor.sim_state,
+            )
+            self.right_talons = (
+                robot.drivetrain_front_right_motor.sim_state,
+                robot.drivetrain_back_right_motor.sim_state,
+            )
+        else:
+            self.left_talons = self.right_talons = ()
+
+    def update_sim(self, now: float, tm_diff: float):
+        rotations_per_meter = drivetrain_cfg.gear_ratio / (
+            math.pi * drivetrain_cfg.wheel_diameter
+        )
+        if wpilib.DriverStation.isEnabled():
+            voltage = wpilib.RobotController.getBatteryVoltage()
+            # the right motors are inverted by their motor controller group
+            left = motor_voltage(
+                self.left_motor,
+                self.drivetrain.getLeftVelocity() * rotations_per_meter,
+                voltage,
+            )
+            right = -motor_voltage(
+                self.right_motor,
+                -self.drivetrain.getRightVelocity() * rotations_per_meter,
+                voltage,
+            )
+        else:
+            left = right = 0.0
+        self.drivetrain.setInputs(left, right)
+        self.drivetrain.update(tm_diff)
+        pose = self.drivetrain.getPose()
+        self.physics_controller.field.setRobotPose(pose)
+
+        # the navX angle is continuous, increases clockwise and starts at 0
+        degrees = pose.rotation().degrees()
+        self.heading += math.remainder(degrees - self.heading, 360)
+        self.gyro_yaw.set(self.start_heading - self.heading)
+
+        for talons, position, velocity in (
+            (
+                self.left_talons,
+                self.drivetrain.getLeftPosition(),
+                self.drivetrain.getLeftVelocity(),
+            ),
+            (
+                self.right_talons,
+                -self.drivetrain.getRightPosition(),
+                -self.drivetrain.getRightVelocity(),
+            ),
+        ):
+            for talon in talons:
+                talon.set_raw_rotor_position(position * rotations_per_meter)
+                talon.set_rotor_velocity(velocity * rotations_per_meter)
+
+        self.camera.update(now, pose)
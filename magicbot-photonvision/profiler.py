@@ -0,0 +1,156 @@
+import math
+import time
+
+from ntcore import NetworkTableInstance
+
+
+class LatencyHistogram:
+    """Fixed-size histogram of execution times. Samples longer than the
+    histogram's range are counted in a final overflow bucket, so memory use
+    never grows no matter how long the robot runs.
+    """
+
+    def __init__(self, budget: float, resolution: float, span: float):
+        """Arguments:
+        budget -- samples longer than this (in seconds) count as overruns
+        resolution -- width of each bucket in seconds
+        span -- samples up to this length (in seconds) are binned exactly
+        """
+        self.budget = budget
+        self.resolution = resolution
+        self.buckets = [0] * (math.ceil(span / resolution) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.buckets)):
+            self.buckets[i] = 0
+        self.count = 0
+        self.overruns = 0
+        self.max = 0.0
+
+    def add(self, sample: float):
+        index = int(sample / self.resolution)
+        if index >= len(self.buckets):
+            index = len(self.buckets) - 1
+        self.buckets[index] += 1
+        self.count += 1
+        if sample > self.budget:
+            self.overruns += 1
+        if sample > self.max:
+            self.max = sample
+
+    def percentile(self, p: float) -> float:
+        """Return the upper edge of the bucket containing the `p`th
+        percentile (0 to 100), or the maximum if that bucket is the overflow
+        """
+        if self.count == 0:
+            return 0.0
+        target = self.count * p / 100
+        total = 0
+        for i, n in enumerate(self.buckets[:-1]):
+            total += n
+            if total >= target:
+                return min((i + 1) * self.resolution, self.max)
+        return self.max
+
+
+class LoopProfiler:
+    """Opt-in profiler that times the robot's `teleopPeriodic()` and the
+    `execute()` method of every magicbot component. When disabled, nothing
+    is wrapped and `publish()` returns immediately, so it can be left in
+    the code at no real cost.
+
+    Summaries are published to the `/profiler` networktable as arrays of
+    [p50 (ms), p99 (ms), max (ms), overruns, samples].
+    """
+
+    def __init__(
+        self,
+        period: float,
+        enabled: bool = True,
+        resolution: float = 0.0001,
+        publish_period: float = 1.0,
+    ):
+        """Arguments:
+        period -- length of the control loop in seconds. An overrun is
+            counted whenever a single section takes longer than this.
+        enabled -- if False, the profiler does nothing
+        resolution -- width of each histogram bucket in seconds
+        publish_period -- how often summaries are sent to networktables
+        """
+        self.period = period
+        self.enabled = enabled
+        self.resolution = resolution
+        self.publish_period = publish_period
+        self.histograms = {}
+        self._publishers = {}
+        self._last_publish = 0.0
+
+    def wrap(self, name: str, func):
+        """Return `func` wrapped so that every call is timed and recorded
+        under `name`
+        """
+        histogram = LatencyHistogram(self.period, self.resolution, 2 * self.period)
+        self.histograms[name] = histogram
+        clock = time.perf_counter
+        add = histogram.add
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add(clock() - start)
+
+        timed.__wrapped__ = func
+        return timed
+
+    def instrument(self, robot):
+        """Wrap `robot.teleopPeriodic()` and the `execute()` method of each
+        of the robot's components. Must be called after components have been
+        created (eg. in `teleopInit()`); calling it again has no effect.
+        """
+        if not self.enabled or self.histograms:
+            return
+        robot.teleopPeriodic = self.wrap("teleopPeriodic", robot.teleopPeriodic)
+        # magicbot only stores its component list privately
+        for name, component in robot._components:
+            component.execute = self.wrap(name, component.execute)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def summary(self) -> str:
+        """Return a one-line-per-section summary suitable for logging"""
+        return "\n".join(
+            f"{name}: p50={h.percentile(50) * 1000:.2f}ms "
+            f"p99={h.percentile(99) * 1000:.2f}ms max={h.max * 1000:.2f}ms "
+            f"overruns={h.overruns}/{h.count}"
+            for name, h in self.histograms.items()
+        )
+
+    def publish(self):
+        """Publish summaries to networktables, at most once every
+        `publish_period` seconds
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now - self._last_publish < self.publish_period:
+            return
+        self._last_publish = now
+        if not self._publishers:
+            table = NetworkTableInstance.getDefault().getTable("profiler")
+            for name in self.histograms:
+                self._publishers[name] = table.getDoubleArrayTopic(name).publish()
+        for name, h in self.histograms.items():
+            self._publishers[name].set(
+                [
+                    h.percentile(50) * 1000,
+                    h.percentile(99) * 1000,
+                    h.max * 1000,
+                    h.overruns,
+                    h.count,
+                ]
+            )
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Replays the joystick, gyro and vision streams of a .wpilog recorded by
+`DataLogger` through `DriveControl` and the robot's teleop code, without any
+hardware and as fast as possible. The drivetrain commands that result are
+returned as an array, so the effect of a tuning change can be checked in
+seconds against the recorded commands or a previous replay. Only teleop
+loops are replayed; the commands of autonomous loops are NaN.
+
+The fused pose from `PoseEstimator` is not replayed, since it depends on
+wheel odometry; `DriveControl` acts on the filtered camera outputs instead.
+
+Usage: python replay.py LOG [--set NAME=VALUE ...] [--output FILE.npy]
+"""
+
+import argparse
+import contextlib
+
+import numpy as np
+from magicbot.magic_tunable import setup_tunables
+from wpilib import Timer
+from wpilib.simulation import pauseTiming, resumeTiming, stepTiming
+from wpimath.geometry import Rotation2d
+from wpiutil.log import DataLogReader
+
+from components.drive_control import DriveControl
+from components.vision import Vision, VisionSnapshot
+import robot
+
+
+def read_log(path) -> tuple[dict, dict]:
+    """Returns the values and timestamps (in seconds) of every entry in a
+    .wpilog file, as two dicts of {entry name: [values]}
+    """
+    entries = {}
+    values = {}
+    times = {}
+    for record in DataLogReader(str(path)):
+        if record.isStart():
+            start = record.getStartData()
+            entries[start.entry] = (start.name, start.type)
+            values[start.name] = []
+            times[start.name] = []
+        elif not record.isControl():
+            # records are only valid during iteration, so decode them now
+            name, type = entries[record.getEntry()]
+            if type == "double":
+                values[name].append(record.getDouble())
+            elif type == "boolean":
+                values[name].append(record.getBoolean())
+            else:
+                values[name].append(record.getDoubleArray())
+            times[name].append(record.getTimestamp() / 1e6)
+    return values, times
+
+
+class Recording:
+    """Per-loop sensor and command streams. Every array has one element
+    (or row) per robot loop, except the vision ones, which only hold the
+    snapshots that changed.
+    """
+
+    def __init__(
+        self,
+        times,
+        angle,
+        rate,
+        joystick_x,
+        joystick_y,
+        joystick_trigger,
+        joystick_precision=None,
+        teleop=None,
+        vision_times=(),
+        vision=(),
+        commands=None,
+    ):
+        """Arguments:
+        times -- FPGA timestamp of each loop in seconds
+        angle, rate -- gyro readings
+        joystick_x, joystick_y, joystick_trigger -- joystick readings
+        joystick_precision -- whether the precision button was held (never,
+                              if not given)
+        teleop -- whether the robot was in teleop (always, if not given)
+        vision_times -- FPGA timestamp at which each vision snapshot was taken
+        vision -- rows of [valid, id, x, y, z, heading, latency, timestamp]
+        commands -- rows of recorded [forward, turn] drivetrain commands
+        """
+        self.times = np.asarray(times, dtype=float)
+        self.angle = np.asarray(angle, dtype=float)
+        self.rate = np.asarray(rate, dtype=float)
+        self.joystick_x = np.asarray(joystick_x, dtype=float)
+        self.joystick_y = np.asarray(joystick_y, dtype=float)
+        self.joystick_trigger = np.asarray(joystick_trigger, dtype=bool)
+        if joystick_precision is None:
+            joystick_precision = np.zeros(len(self.times))
+        self.joystick_precision = np.asarray(joystick_precision, dtype=bool)
+        if teleop is None:
+            teleop = np.ones(len(self.times))
+        self.teleop = np.asarray(teleop, dtype=bool)
+        self.vision_times = np.asarray(vision_times, dtype=float)
+        self.vision = np.asarray(vision, dtype=float).reshape(-1, 8)
+        self.commands = None if commands is None else np.asarray(commands, dtype=float)
+
+    @classmethod
+    def load(cls, path) -> "Recording":
+        values, times = read_log(path)
+        return cls(
+            times["gyro/angle"],
+            values["gyro/angle"],
+            values["gyro/rate"],
+            values["joystick/x"],
+            values["joystick/y"],
+            values["joystick/trigger"],
+            values["joystick/precision"],
+            values["robot/teleop"],
+            times["vision/snapshot"],
+            values["vision/snapshot"],
+            np.column_stack((values["drivetrain/forward"], values["drivetrain/turn"])),
+        )
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+class ReplayGyro:
+    """Stands in for `navx.AHRS`, returning the current loop's readings"""
+
+    angle = 0.0
+    rate = 0.0
+
+    def getAngle(self) -> float:
+        return self.angle
+
+    def getRate(self) -> float:
+        return self.rate
+
+    def getRotation2d(self) -> Rotation2d:
+        return Rotation2d.fromDegrees(-self.angle)
+
+
+class ReplayJoystick:
+    """Stands in for `wpilib.Joystick`, returning the current loop's readings"""
+
+    x = 0.0
+    y = 0.0
+    trigger = False
+    precision = False
+
+    def getX(self) -> float:
+        return self.x
+
+    def getY(self) -> float:
+        return self.y
+
+    def getTrigger(self) -> bool:
+        return self.trigger
+
+    def getRawButton(self, button: int) -> bool:
+        # only the trigger and the precision button are recorded
+        return button == robot.precision_button and self.precision
+
+
+class ReplayVision(Vision):
+    """`Vision` whose snapshot is set from recorded values instead of being
+    read from a `PhotonCamera`
+    """
+
+    def __init__(self, time_offset: float):
+        """Arguments:
+        time_offset -- added to recorded timestamps to match the replay clock
+        """
+        self.time_offset = time_offset
+        self._frame_timestamp = -1
+        self._pose_estimate = None
+        self.snapshot = VisionSnapshot()
+
+    def set_snapshot(self, values):
+        valid, id, x, y, z, heading, latency, timestamp = values
+        snapshot = self.snapshot
+        snapshot.valid = bool(valid)
+        snapshot.id = int(id)
+        snapshot.x = x
+        snapshot.y = y
+        snapshot.z = z
+        snapshot.heading = heading
+        snapshot.latency = latency
+        if timestamp >= 0:
+            snapshot.timestamp = timestamp + self.time_offset
+            self._frame_timestamp = snapshot.timestamp
+
+    def execute(self):
+        pass
+
+
+class ReplayPoseEstimator:
+    """Stands in for `PoseEstimator`, which can't be replayed"""
+
+    def has_vision_fix(self) -> bool:
+        return False
+
+
+class ReplayDrivetrain:
+    """Stands in for `Drivetrain`, keeping the commands it is given. This is
+    deliberately narrower than the real drivetrain: the teleop code and
+    `DriveControl` only give it arcade commands, which are what `DataLogger`
+    records, while the kinematics and motor outputs that follow from them
+    depend on the hardware and are not replayed.
+    """
+
+    forward = 0.0
+    turn = 0.0
+
+    def arcade_drive(self, forward: float, turn: float):
+        self.forward = forward
+        self.turn = turn
+
+    def stop(self):
+        self.forward = 0.0
+        self.turn = 0.0
+
+
+class ReplayRobot:
+    """Holds the replayed components and runs `MyRobot`'s teleop code on them"""
+
+    create_drive_inputs = robot.MyRobot.create_drive_inputs
+    teleopPeriodic = robot.MyRobot.teleopPeriodic
+
+    def __init__(self, time_offset: float, tunables: dict = None):
+        self.gyro = ReplayGyro()
+        self.joystick = ReplayJoystick()
+        self.vision = ReplayVision(time_offset)
+        self.drivetrain = ReplayDrivetrain()
+        self.drive_inputs = self.create_drive_inputs()
+
+        self.drive_control = DriveControl()
+        self.drive_control.drivetrain = self.drivetrain
+        self.drive_control.pose_estimator = ReplayPoseEstimator()
+        self.drive_control.vision = self.vision
+        self.drive_control.gyro = self.gyro
+        setup_tunables(self.drive_control, "drive_control")
+        for name, value in (tunables or {}).items():
+            setattr(self.drive_control, name, value)
+        self.drive_control.setup()
+
+    def close(self):
+        self.drive_control.turn_to_angle_tunables.close()
+        self.drive_control.drive_from_tag_tunables.close()
+
+    def consumeExceptions(self):
+        # exceptions should stop a replay rather than be reported and ignored
+        return contextlib.nullcontext()
+
+
+def replay(recording: Recording, tunables: dict = None) -> np.ndarray:
+    """Steps the robot's teleop code and `DriveControl` through every teleop
+    loop of `recording` and returns the resulting [forward, turn] commands,
+    one row per loop. Autonomous loops are skipped, since they are driven by
+    the autonomous modes rather than the joystick, and their rows are NaN.
+
+    Arguments:
+    recording -- sensor streams to replay
+    tunables -- values for `DriveControl`'s tunables, by attribute name
+    """
+    commands = np.zeros((len(recording), 2))
+    pauseTiming()
+    time_offset = Timer.getFPGATimestamp() - recording.times[0]
+    harness = ReplayRobot(time_offset, tunables)
+    try:
+        gyro = harness.gyro
+        joystick = harness.joystick
+        drivetrain = harness.drivetrain
+        vision_index = 0
+        times = recording.times
+        last_time = times[0]
+        for i, time in enumerate(times):
+            stepTiming(time - last_time)
+            last_time = time
+            gyro.angle = recording.angle[i]
+            gyro.rate = recording.rate[i]
+            joystick.x = recording.joystick_x[i]
+            joystick.y = recording.joystick_y[i]
+            joystick.trigger = recording.joystick_trigger[i]
+            joystick.precision = recording.joystick_precision[i]
+
+            if recording.teleop[i]:
+                harness.teleopPeriodic()
+                harness.drive_control.execute()
+                commands[i] = drivetrain.forward, drivetrain.turn
+            else:
+                commands[i] = np.nan
+            # the drivetrain's commands reset to 0 after every loop
+            drivetrain.stop()
+
+            # vision is updated after `DriveControl` in the robot loop, so
+            # snapshots logged during this loop are seen by the next one
+            next_time = times[i + 1] if i + 1 < len(times) else np.inf
+            while (
+                vision_index < len(recording.vision_times)
+                and recording.vision_times[vision_index] < next_time
+            ):
+                harness.vision.set_snapshot(recording.vision[vision_index])
+                vision_index += 1
+    finally:
+        harness.close()
+        resumeTiming()
+    return commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("log", help=".wpilog file recorded by DataLogger")
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a DriveControl tunable, eg. turn_to_angle_kP=0.03",
+    )
+    parser.add_argument("--output", help="save the replayed commands as .npy")
+    args = parser.parse_args()
+
+    tunables = {}
+    for override in args.set:
+        name, value = override.split("=")
+        tunables[name] = float(value)
+
+    recording = Recording.load(args.log)
+    commands = replay(recording, tunables)
+    error = np.abs(commands - recording.commands)
+    print(f"replayed {recording.teleop.sum()} of {len(recording)} loops")
+    print(
+        f"max difference from recording: forward {np.nanmax(error[:, 0]):.4f}, "
+        f"turn {np.nanmax(error[:, 1]):.4f}"
+    )
+    if args.output:
+        np.save(args.output, commands)
+
+
+if __name__ == "__main__":
+    main()
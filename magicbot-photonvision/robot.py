@@ -4,21 +4,43 @@ to use Apriltags in a magicbot project. In this case, the robot can be made to
 identify, turn to, or follow Apriltags.
 """
 
+import math
+import time
+
 import wpilib
 from rev import CANSparkMax, CANSparkLowLevel
 import phoenix5
-from magicbot import MagicRobot, feedback
-import navx
+from magicbot import MagicRobot
 from photonlibpy.photonCamera import PhotonCamera
+from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
+from wpimath.controller import SimpleMotorFeedforwardMeters
+from wpimath.geometry import Transform3d, Translation3d, Rotation3d
+from wpimath.kinematics import DifferentialDriveKinematics
 
+from components.data_logger import DataLogger
 from components.drive_control import DriveControl
 from components.drivetrain import Drivetrain
+from components.pose_estimator import PoseEstimator
 from components.vision import Vision
 import config
+import profiler
+import telemetry
+import trajectories
 import util
 
 
 drivetrain_cfg = config.pancake_cfg
+# drive the wheels at a speed with the TalonFX velocity loop, rather than at a
+# duty cycle (ignored for other motor controllers)
+velocity_control = False
+# set to True to time each component and publish the results to networktables
+profile_loop = False
+# seconds between dashboard updates (per key)
+telemetry_period = 0.1
+# record drivetrain, gyro and vision data to a .wpilog file on the robot
+log_data = not wpilib.RobotBase.isSimulation()
+# joystick button held to drive at half speed
+precision_button = 2
 
 
 class MyRobot(MagicRobot):
@@ -30,10 +52,23 @@ class MyRobot(MagicRobot):
 
     drivetrain: Drivetrain
     vision: Vision
+    pose_estimator: PoseEstimator
+    data_logger: DataLogger
 
     def createObjects(self):
         """Initialize all wpilib motors & sensors"""
         self.drivetrain_controller_type = drivetrain_cfg.controller_type
+        self.drivetrain_meters_per_rotation = (
+            math.pi * drivetrain_cfg.wheel_diameter / drivetrain_cfg.gear_ratio
+        )
+        self.drivetrain_track_width = drivetrain_cfg.track_width
+        self.drivetrain_feedforward = SimpleMotorFeedforwardMeters(
+            drivetrain_cfg.ks, drivetrain_cfg.kv, drivetrain_cfg.ka
+        )
+        self.drivetrain_velocity_control = (
+            velocity_control
+            and drivetrain_cfg.controller_type == config.ControllerType.TALON_FX
+        )
         if drivetrain_cfg.controller_type == config.ControllerType.SPARK_MAX:
             self.drivetrain_front_left_motor = CANSparkMax(
                 drivetrain_cfg.front_left_id, CANSparkLowLevel.MotorType.kBrushless
@@ -49,16 +84,16 @@ class MyRobot(MagicRobot):
             )
         elif drivetrain_cfg.controller_type == config.ControllerType.TALON_FX:
             self.drivetrain_front_left_motor = util.WPI_TalonFX(
-                drivetrain_cfg.front_left_id
+                drivetrain_cfg.front_left_id, dedupe=True
             )
             self.drivetrain_front_right_motor = util.WPI_TalonFX(
-                drivetrain_cfg.front_right_id
+                drivetrain_cfg.front_right_id, dedupe=True
             )
             self.drivetrain_back_left_motor = util.WPI_TalonFX(
-                drivetrain_cfg.back_left_id
+                drivetrain_cfg.back_left_id, dedupe=True
             )
             self.drivetrain_back_right_motor = util.WPI_TalonFX(
-                drivetrain_cfg.back_right_id
+                drivetrain_cfg.back_right_id, dedupe=True
             )
         elif drivetrain_cfg.controller_type == config.ControllerType.TALON_SRX:
             self.drivetrain_front_left_motor = phoenix5.WPI_TalonSRX(
@@ -80,58 +115,110 @@ class MyRobot(MagicRobot):
 
         self.camera = PhotonCamera("Global_Shutter_Camera")
         self.vision_filter_window = 10
-
-        self.gyro = navx.AHRS.create_spi()
+        self.vision_background_ingest = True
+        self.vision_estimate_pose = True
+        self.vision_field_layout = AprilTagFieldLayout.loadField(
+            AprilTagField.k2024Crescendo
+        )
+        self.vision_robot_to_camera = Transform3d(
+            Translation3d(0.33, -0.03, 0), Rotation3d()
+        )
+
+        self.pose_estimator_track_width = drivetrain_cfg.track_width
+
+        # generated now so autonomous modes only have to sample them
+        start = time.perf_counter()
+        self.trajectories = trajectories.generate_all(
+            config.auto_constraints,
+            DifferentialDriveKinematics(drivetrain_cfg.track_width),
+            self.drivetrain_feedforward,
+        )
+        self.logger.info(
+            "Generated %d trajectories in %.1f ms",
+            len(self.trajectories),
+            (time.perf_counter() - start) * 1000,
+        )
+
+        self.gyro = util.create_navx()
         self.joystick = wpilib.Joystick(0)
-        self.curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1)
+        self.drive_inputs = self.create_drive_inputs()
+
+        self.data_logger_enabled = log_data
+        self.data_logger_precision_button = precision_button
+
+        self.loop_profiler = profiler.LoopProfiler(
+            self.control_loop_wait_time, enabled=profile_loop
+        )
+
+        # published under /robot like `@feedback`, but not on every loop
+        self.telemetry = telemetry.TelemetryPublisher("robot", telemetry_period)
+        self.telemetry.add_methods(
+            self, ("get_angle", "get_id", "get_x", "get_y", "get_z", "get_heading")
+        )
+
+    def create_drive_inputs(self) -> util.InputShaper:
+        """Returns the arcade drive inputs from `joystick`, which go half
+        speed while `precision_button` is held and are ramped to avoid current
+        spikes
+        """
+        curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1, compiled=True)
+        return (
+            util.InputShaper(lambda: self.joystick.getRawButton(precision_button))
+            .add_axis(self.joystick.getY, curve, rate_limit=2.0)
+            .add_axis(self.joystick.getX, curve, rate_limit=4.0, invert=True)
+        )
+
+    def teleopInit(self):
+        # components only exist once `createObjects()` has returned
+        self.loop_profiler.instrument(self)
+        self.drive_inputs.reset()
 
     def teleopPeriodic(self):
         """Place code here that does things as a result of operator
         actions"""
 
         with self.consumeExceptions():
+            # shaped every loop so the rate limits track the stick
+            forward, turn = self.drive_inputs.update()
             # state machine will only execute when button is held for safety reasons
             if self.joystick.getTrigger():
                 self.drive_control.follow_tag()
             else:
-                self.drivetrain.arcade_drive(
-                    self.curve(self.joystick.getY()), -self.curve(self.joystick.getX())
-                )
+                self.drivetrain.arcade_drive(forward, turn)
+
+    def disabledPeriodic(self):
+        # applying motor configs blocks, so gains are only sent while disabled
+        with self.consumeExceptions():
+            self.drivetrain.update_gains()
+
+    def robotPeriodic(self):
+        super().robotPeriodic()
+        with self.consumeExceptions():
+            self.telemetry.update()
+        self.loop_profiler.publish()
 
-    @feedback
     def get_angle(self) -> float:
         return self.gyro.getAngle()
 
-    @feedback
     def get_id(self) -> int:
-        id = self.vision.getId()
-        if id is not None:
-            return id
-        return -1
-
-    @feedback
-    def get_x(self) -> int:
-        if self.vision.hasTargets():
-            return self.vision.getX()
-        return 0
-
-    @feedback
-    def get_y(self) -> int:
-        if self.vision.hasTargets():
-            return self.vision.getY()
-        return 0
-
-    @feedback
-    def get_z(self) -> int:
-        if self.vision.hasTargets():
-            return self.vision.getZ()
-        return 0
-
-    @feedback
-    def get_heading(self) -> int:
-        if self.vision.hasTargets():
-            return self.vision.getHeading()
-        return 0
+        target = self.vision.getSnapshot()
+        return target.id if target.valid else -1
+
+    def get_x(self) -> float:
+        target = self.vision.getSnapshot()
+        return target.x if target.valid else 0.0
+
+    def get_y(self) -> float:
+        target = self.vision.getSnapshot()
+        return target.y if target.valid else 0.0
+
+    def get_z(self) -> float:
+        target = self.vision.getSnapshot()
+        return target.z if target.valid else 0.0
+
+    def get_heading(self) -> float:
+        target = self.vision.getSnapshot()
+        return target.heading if target.valid else 0.0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+from wpilib import Timer
+from ntcore import NetworkTableInstance
+
+
+class TelemetryPublisher:
+    """Rate-limited replacement for magicbot's `@feedback`, which calls every
+    feedback method and writes it to networktables on every loop. Here each
+    key has its own publish period; `update()` calls only the getters that
+    are due, caches their values in `values`, and publishes them together.
+
+    Keys are published to the `/<table>` networktable, so getters registered
+    with `add_methods()` appear under the same names `@feedback` would use.
+    """
+
+    def __init__(self, table: str, period: float = 0.1):
+        """Arguments:
+        table -- name of the networktable to publish to
+        period -- default time in seconds between updates of each key
+        """
+        self.table = NetworkTableInstance.getDefault().getTable(table)
+        self.period = period
+        self.slack = 0.001
+        # latest value of every key, as of the last time it was published
+        self.values = {}
+        self._getters = []
+
+    def add(self, key: str, getter, period: float = None):
+        """Publish the result of calling `getter()` under `key` every `period`
+        seconds (or at the default period if not given)
+        """
+        if period is None:
+            period = self.period
+        # [next due time, period, key, getter, entry]
+        self._getters.append([0.0, period, key, getter, self.table.getEntry(key)])
+
+    def add_methods(self, obj, names, period: float = None):
+        """Publish each of `obj`'s methods in `names`, with keys named the
+        way `@feedback` names them (without any `get_` prefix)
+        """
+        for name in names:
+            key = name[4:] if name.startswith("get_") else name
+            self.add(key, getattr(obj, name), period)
+
+    def update(self):
+        """Publish every key that is due. Call once per loop."""
+        now = Timer.getFPGATimestamp()
+        due = []
+        for item in self._getters:
+            if now >= item[0]:
+                # the slack lets a key whose period matches the loop's be
+                # published every loop despite timing jitter
+                item[0] = now + item[1] - self.slack
+                value = item[3]()
+                self.values[item[2]] = value
+                due.append((item[4], value))
+        for entry, value in due:
+            entry.setValue(value)
@@ -0,0 +1,96 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from magicbot.magic_tunable import setup_tunables
+from wpilib.simulation import DriverStationSim, pauseTiming, resumeTiming, stepTiming
+from wpimath.controller import SimpleMotorFeedforwardMeters
+
+from autonomous.follow_trajectory import LeaveAndReturn
+from components.drivetrain import Drivetrain
+from components.pose_estimator import PoseEstimator
+import config
+import robot
+import trajectories
+import util
+
+
+def test_missing_trajectory_fails_at_setup():
+    auto = LeaveAndReturn()
+    auto.trajectories = {"leave_speaker": None}
+    with pytest.raises(KeyError):
+        auto.setup()
+
+
+def test_leave_and_return_follows_trajectories(make_physics):
+    cfg = robot.drivetrain_cfg
+    motors = [
+        util.WPI_TalonFX(id)
+        for id in (
+            cfg.front_left_id,
+            cfg.front_right_id,
+            cfg.back_left_id,
+            cfg.back_right_id,
+        )
+    ]
+    gyro = util.create_navx()
+    physics = make_physics(motors, "autonomous_test")
+
+    drivetrain = Drivetrain()
+    drivetrain.front_left_motor = motors[0]
+    drivetrain.front_right_motor = motors[1]
+    drivetrain.back_left_motor = motors[2]
+    drivetrain.back_right_motor = motors[3]
+    drivetrain.controller_type = cfg.controller_type
+    drivetrain.track_width = cfg.track_width
+    drivetrain.feedforward = SimpleMotorFeedforwardMeters(cfg.ks, cfg.kv, cfg.ka)
+    drivetrain.velocity_control = False
+    drivetrain.setup()
+    drivetrain.stop()
+    # read from the physics, see `physics.motor_voltage`
+    drivetrain.get_wheel_positions = lambda: (
+        physics.drivetrain.getLeftPosition(),
+        physics.drivetrain.getRightPosition(),
+    )
+
+    pose_estimator = PoseEstimator()
+    pose_estimator.drivetrain = drivetrain
+    pose_estimator.vision = SimpleNamespace(getPoseEstimate=lambda: None)
+    pose_estimator.gyro = gyro
+    pose_estimator.track_width = cfg.track_width
+    pose_estimator.setup()
+
+    auto = LeaveAndReturn()
+    auto.logger = logging.getLogger("autonomous_test")
+    setup_tunables(auto, "autonomous_test")
+    auto.drivetrain = drivetrain
+    auto.pose_estimator = pose_estimator
+    auto.trajectories = trajectories.generate_all(
+        config.auto_constraints,
+        drivetrain.kinematics,
+        drivetrain.feedforward,
+    )
+    auto.setup()
+    total_time = sum(trajectory.totalTime() for trajectory in auto.queue)
+
+    DriverStationSim.setEnabled(True)
+    DriverStationSim.notifyNewData()
+    pauseTiming()
+    try:
+        auto.on_enable()
+        loops = 0
+        while auto.is_executing or loops == 0:
+            auto.on_iteration(loops * 0.02)
+            drivetrain.execute()
+            pose_estimator.execute()
+            drivetrain.stop()
+            physics.update_sim(loops * 0.02, 0.02)
+            stepTiming(0.02)
+            loops += 1
+            assert loops * 0.02 < total_time + 1
+    finally:
+        resumeTiming()
+
+    end = physics.drivetrain.getPose().relativeTo(trajectories.speaker_pose)
+    assert end.translation().norm() < 0.1
+    assert abs(end.rotation().degrees()) < 5
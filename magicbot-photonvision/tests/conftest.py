@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+import wpilib
+from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
+from wpimath.geometry import Transform3d
+
+from physics import PhysicsEngine
+
+field_layout = AprilTagFieldLayout.loadField(AprilTagField.k2024Crescendo)
+
+
+@pytest.fixture
+def make_physics():
+    """Returns a function that builds a `PhysicsEngine` for a robot with the
+    given drivetrain motors and camera, without creating the whole robot
+    """
+
+    def make(
+        motors: list, camera: str, robot_to_camera: Transform3d = Transform3d()
+    ) -> PhysicsEngine:
+        """Arguments:
+        motors -- front left, front right, back left and back right motors
+        camera -- name of the simulated camera
+        robot_to_camera -- position of the camera on the robot
+        """
+        robot = SimpleNamespace(
+            drivetrain_front_left_motor=motors[0],
+            drivetrain_front_right_motor=motors[1],
+            drivetrain_back_left_motor=motors[2],
+            drivetrain_back_right_motor=motors[3],
+            camera=SimpleNamespace(getName=lambda: camera),
+            vision_robot_to_camera=robot_to_camera,
+            vision_field_layout=field_layout,
+        )
+        return PhysicsEngine(SimpleNamespace(field=wpilib.Field2d()), robot)
+
+    return make
@@ -0,0 +1,120 @@
+import time
+from types import SimpleNamespace
+
+from wpilib.simulation import DriverStationSim
+from wpiutil.log import DataLog
+
+from components.data_logger import DataLogger
+from components.vision import VisionSnapshot
+from replay import read_log
+import util
+
+
+def make_logger(log: DataLog, motors, snapshot: VisionSnapshot) -> DataLogger:
+    """Returns a set up logger reading from `motors` and fixed inputs"""
+    logger = DataLogger()
+    logger.drivetrain = SimpleNamespace(
+        forward=0.3,
+        turn=-0.2,
+        front_left_motor=motors[0],
+        front_right_motor=motors[1],
+        back_left_motor=motors[2],
+        back_right_motor=motors[3],
+    )
+    logger.gyro = SimpleNamespace(getAngle=lambda: 90.0, getRate=lambda: 5.0)
+    logger.joystick = SimpleNamespace(
+        getX=lambda: 0.5,
+        getY=lambda: -0.25,
+        getTrigger=lambda: True,
+        getRawButton=lambda button: button == 2,
+    )
+    logger.vision = SimpleNamespace(getSnapshot=lambda: snapshot)
+    logger.enabled = True
+    logger.precision_button = 2
+    logger.log = log
+    logger.setup()
+    return logger
+
+
+def read_values(log: DataLog, path, count: int) -> dict:
+    """Stops `log` once it has written `count` loops and returns its values"""
+    # the log is written on a background thread
+    log.flush()
+    values = {}
+    for _ in range(100):
+        time.sleep(0.02)
+        try:
+            values = read_log(path)[0] if path.exists() else {}
+        except KeyError:
+            # read while a record was partly written
+            continue
+        if len(values.get("gyro/rate", ())) == count:
+            break
+    log.stop()
+    return values
+
+
+def test_data_logger_records_signals(tmp_path):
+    log = DataLog(str(tmp_path), "test.wpilog", period=0.01)
+    motors = [SimpleNamespace(get=lambda i=i: i / 10) for i in range(4)]
+    snapshot = VisionSnapshot()
+    logger = make_logger(log, motors, snapshot)
+
+    logger.execute()
+    snapshot.valid = True
+    snapshot.id = 4
+    snapshot.x = 2.0
+    snapshot.timestamp = 1.5
+    logger.execute()
+    # unchanged snapshot is not recorded again
+    DriverStationSim.setAutonomous(True)
+    DriverStationSim.notifyNewData()
+    try:
+        logger.execute()
+    finally:
+        DriverStationSim.setAutonomous(False)
+        DriverStationSim.notifyNewData()
+    values = read_values(log, tmp_path / "test.wpilog", 3)
+
+    assert values["drivetrain/forward"] == [0.3] * 3
+    assert values["drivetrain/turn"] == [-0.2] * 3
+    assert values["drivetrain/motor_outputs"][0] == [
+        0.0,
+        0.1,
+        0.2,
+        0.3,
+    ]
+    assert values["gyro/angle"] == [90.0] * 3
+    assert values["gyro/rate"] == [5.0] * 3
+    assert values["joystick/x"] == [0.5] * 3
+    assert values["joystick/y"] == [-0.25] * 3
+    assert values["joystick/trigger"] == [True] * 3
+    assert values["joystick/precision"] == [True] * 3
+    assert values["robot/teleop"] == [True, True, False]
+    vision = values["vision/snapshot"]
+    assert len(vision) == 2
+    assert vision[1] == [1.0, 4.0, 2.0, 0.0, 0.0, 0.0, 0.0, 1.5]
+
+
+def test_data_logger_records_applied_velocity_output(tmp_path):
+    log = DataLog(str(tmp_path), "test.wpilog", period=0.01)
+    motors = [util.WPI_TalonFX(id) for id in range(31, 35)]
+    logger = make_logger(log, motors, VisionSnapshot())
+
+    for motor in motors:
+        motor.set(0.5)
+        motor.set_velocity(10.0)
+    logger.execute()
+    values = read_values(log, tmp_path / "test.wpilog", 1)
+
+    # not the duty cycle last set, as the motors follow their velocity loops
+    applied = [motor.get_duty_cycle().value for motor in motors]
+    assert values["drivetrain/motor_outputs"][0] == applied
+    assert applied != [0.5] * 4
+
+
+def test_data_logger_disabled():
+    logger = DataLogger()
+    logger.enabled = False
+    logger.setup()
+    logger.execute()
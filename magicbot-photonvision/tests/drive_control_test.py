@@ -0,0 +1,130 @@
+import math
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from magicbot.magic_tunable import setup_tunables
+from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
+from wpilib import Timer
+from wpilib.simulation import pauseTiming, resumeTiming, stepTiming
+from wpimath.geometry import Pose2d, Rotation2d, Rotation3d, Transform3d, Translation3d
+
+from components.drive_control import DriveControl, adjust_heading, adjust_heading_numpy
+from components.vision import TagPoseEstimator
+import heading_benchmark
+
+
+def test_adjust_heading_matches_numpy():
+    rng = np.random.default_rng(0)
+    for _ in range(1000):
+        rc = rng.uniform(-1, 1, 3)
+        ct = rng.uniform(-3, 3, 3)
+        assert math.isclose(
+            adjust_heading(tuple(rc), tuple(ct)),
+            adjust_heading_numpy(rc, ct),
+            abs_tol=1e-9,
+        )
+
+
+def test_adjust_heading_2d_robot_to_camera():
+    ct = (1.5, 0.4, 0.2)
+    assert math.isclose(adjust_heading((0.35, 0), ct), adjust_heading((0.35, 0, 0), ct))
+    assert math.isclose(
+        adjust_heading((0.35, 0), ct), adjust_heading_numpy(np.array([0.35, 0]), ct)
+    )
+
+
+def test_adjust_heading_benchmark_cases_match_numpy():
+    for rc, ct in heading_benchmark.cases.values():
+        assert math.isclose(
+            adjust_heading(rc, ct),
+            adjust_heading_numpy(np.array(rc), np.array(ct)),
+            abs_tol=1e-12,
+        )
+
+
+def test_camera_to_tag_from_pose():
+    field_layout = AprilTagFieldLayout.loadField(AprilTagField.k2024Crescendo)
+    tag = field_layout.getTagPose(7).toPose2d()
+    drive_control = DriveControl.__new__(DriveControl)
+    # robot 2m in front of the tag, facing it
+    drive_control.pose_estimator = SimpleNamespace(
+        has_vision_fix=lambda: True,
+        get_pose=lambda: Pose2d(tag.X() + 2, tag.Y(), Rotation2d.fromDegrees(180)),
+    )
+    robot_to_camera = Transform3d(Translation3d(0.33, -0.03, 0), Rotation3d())
+    snapshot = SimpleNamespace(valid=True, id=7)
+    drive_control.vision = SimpleNamespace(
+        getSnapshot=lambda: snapshot,
+        estimator=TagPoseEstimator(field_layout, robot_to_camera),
+        robot_to_camera=robot_to_camera,
+    )
+    ct = drive_control.get_camera_to_tag()
+    assert math.isclose(ct.X(), 2 - 0.33, abs_tol=1e-9)
+    assert math.isclose(ct.Y(), 0.03, abs_tol=1e-9)
+
+    # not in the field layout
+    snapshot.id = 99
+    assert drive_control.get_camera_to_tag() is None
+
+    drive_control.pose_estimator.has_vision_fix = lambda: False
+    assert drive_control.get_camera_to_tag() is None
+
+
+def test_heading_at_frame_time():
+    gyro = SimpleNamespace(angle=0.0)
+    gyro.getAngle = lambda: gyro.angle
+    drive_control = DriveControl()
+    drive_control.gyro = gyro
+    setup_tunables(drive_control, "drive_control_test")
+    drive_control.setup()
+    # nothing recorded yet
+    assert drive_control.get_heading_at(0.0) == 0.0
+
+    pauseTiming()
+    try:
+        start = Timer.getFPGATimestamp()
+        # 2 seconds of turning at 500 degrees per second
+        for i in range(100):
+            gyro.angle = 10.0 * i
+            drive_control.execute()
+            stepTiming(0.02)
+    finally:
+        resumeTiming()
+        drive_control.turn_to_angle_tunables.close()
+        drive_control.drive_from_tag_tunables.close()
+    gyro.angle = 2000.0
+
+    # halfway between the samples of loops 80 and 81
+    assert math.isclose(drive_control.get_heading_at(start + 1.61), 805.0)
+    assert drive_control.get_heading_at(start + 1.98) == 990.0
+    # later than the newest sample, or older than the 1 second kept
+    assert drive_control.get_heading_at(start + 5.0) == 990.0
+    assert 490.0 <= drive_control.get_heading_at(start) <= 500.0
+    assert drive_control.get_heading_at(None) == 2000.0
+
+
+def test_drive_from_tag_tunables_only_read_when_changed():
+    drive_control = DriveControl()
+    setup_tunables(drive_control, "drive_control_test")
+    drive_control.setup()
+    controller = drive_control.drive_from_tag_controller
+    kp = drive_control.drive_from_tag_kP
+    try:
+        drive_control.drive_from_tag_kP = kp * 2
+        # wait for the networktables listener to see the edit
+        deadline = time.monotonic() + 1.0
+        while not drive_control.drive_from_tag_tunables._dirty:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+        assert controller.getP() == kp
+
+        drive_control.drive_from_tag_tunables.update()
+        assert controller.getP() == kp * 2
+        # setting the distance from code takes effect straight away
+        drive_control.set_drive_from_tag(0.5)
+        assert controller.getSetpoint() == 0.5
+    finally:
+        drive_control.turn_to_angle_tunables.close()
+        drive_control.drive_from_tag_tunables.close()
+        drive_control.drive_from_tag_kP = kp
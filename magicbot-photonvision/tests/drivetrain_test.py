@@ -0,0 +1,131 @@
+import math
+import time
+
+from magicbot.magic_tunable import setup_tunables
+from wpilib.simulation import DriverStationSim, pauseTiming, resumeTiming, stepTiming
+from wpimath.controller import SimpleMotorFeedforwardMeters
+from wpimath.kinematics import ChassisSpeeds
+
+from components.drivetrain import Drivetrain
+from config import ControllerType
+from physics import PhysicsEngine
+import robot
+import util
+
+
+def make_drivetrain(make_physics) -> tuple[Drivetrain, PhysicsEngine]:
+    """Returns a drivetrain in velocity control mode and its physics"""
+    cfg = robot.drivetrain_cfg
+    motors = [util.WPI_TalonFX(id) for id in range(21, 25)]
+    physics = make_physics(motors, "drivetrain_test")
+
+    drivetrain = Drivetrain()
+    drivetrain.front_left_motor = motors[0]
+    drivetrain.front_right_motor = motors[1]
+    drivetrain.back_left_motor = motors[2]
+    drivetrain.back_right_motor = motors[3]
+    drivetrain.controller_type = ControllerType.TALON_FX
+    drivetrain.meters_per_rotation = math.pi * cfg.wheel_diameter / cfg.gear_ratio
+    drivetrain.track_width = cfg.track_width
+    drivetrain.feedforward = SimpleMotorFeedforwardMeters(cfg.ks, cfg.kv, cfg.ka)
+    drivetrain.velocity_control = True
+    setup_tunables(drivetrain, "drivetrain_test")
+    drivetrain.setup()
+    return drivetrain, physics
+
+
+def run(drivetrain: Drivetrain, physics: PhysicsEngine, command, seconds: float):
+    """Calls `command` and runs the drivetrain and physics each loop"""
+    DriverStationSim.setEnabled(True)
+    DriverStationSim.notifyNewData()
+    pauseTiming()
+    try:
+        for i in range(round(seconds / 0.02)):
+            drivetrain.stop()
+            command()
+            drivetrain.execute()
+            physics.update_sim(i * 0.02, 0.02)
+            stepTiming(0.02)
+    finally:
+        resumeTiming()
+        drivetrain.velocity_tunables.close()
+
+
+def test_velocity_control_tracks_speeds(make_physics):
+    drivetrain, physics = make_drivetrain(make_physics)
+    speeds = ChassisSpeeds(1.5, 0, 1.0)
+    run(drivetrain, physics, lambda: drivetrain.drive_speeds(speeds), 2.0)
+
+    wheel_speeds = drivetrain.kinematics.toWheelSpeeds(speeds)
+    assert math.isclose(
+        physics.drivetrain.getLeftVelocity(), wheel_speeds.left, abs_tol=0.05
+    )
+    assert math.isclose(
+        physics.drivetrain.getRightVelocity(), wheel_speeds.right, abs_tol=0.05
+    )
+
+
+def test_velocity_control_arcade_scales_to_max_speed(make_physics):
+    drivetrain, physics = make_drivetrain(make_physics)
+    run(drivetrain, physics, lambda: drivetrain.arcade_drive(0.5, 0), 2.0)
+
+    # arcade inputs are squared
+    expected = 0.25 * drivetrain.max_speed
+    assert math.isclose(physics.drivetrain.getLeftVelocity(), expected, abs_tol=0.05)
+    assert math.isclose(physics.drivetrain.getRightVelocity(), expected, abs_tol=0.05)
+    assert drivetrain.front_left_motor.config.slot0.k_p == drivetrain.velocity_kP
+
+
+def test_velocity_gains_only_sent_by_update_gains(make_physics):
+    drivetrain, physics = make_drivetrain(make_physics)
+    kp = drivetrain.velocity_kP
+    try:
+        drivetrain.velocity_kP = kp * 2
+        # wait for the networktables listener to see the edit
+        deadline = time.monotonic() + 1.0
+        while not drivetrain.velocity_tunables._dirty:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+
+        drivetrain.drive_speeds(ChassisSpeeds(1.0, 0, 0))
+        drivetrain.execute()
+        assert drivetrain.front_left_motor.config.slot0.k_p == kp
+
+        drivetrain.update_gains()
+        assert drivetrain.front_left_motor.config.slot0.k_p == kp * 2
+        assert drivetrain.front_right_motor.config.slot0.k_p == kp * 2
+    finally:
+        drivetrain.velocity_tunables.close()
+        drivetrain.velocity_kP = kp
+
+
+def test_wheel_positions_from_telemetry(make_physics):
+    drivetrain, _ = make_drivetrain(make_physics)
+    try:
+        motors = (
+            drivetrain.front_left_motor,
+            drivetrain.front_right_motor,
+            drivetrain.back_left_motor,
+            drivetrain.back_right_motor,
+        )
+        # driving forward turns the inverted right side motors backwards
+        positions = [2.0, -1.0, 4.0, -3.0]
+        assert drivetrain.get_wheel_positions() is None
+        for motor, position in zip(motors, positions):
+            motor.sim_state.set_raw_rotor_position(position)
+            motor.sim_state.set_rotor_velocity(0)
+        # wait for the simulated motors to report their new state
+        for _ in range(100):
+            drivetrain.stop()
+            drivetrain.execute()
+            telemetry = drivetrain.get_telemetry()
+            if [motor.position for motor in telemetry.motors] == positions:
+                break
+            time.sleep(0.01)
+
+        assert [motor.position for motor in telemetry.motors] == positions
+        left, right = drivetrain.get_wheel_positions()
+        assert math.isclose(left, 3.0 * drivetrain.meters_per_rotation)
+        assert math.isclose(right, 2.0 * drivetrain.meters_per_rotation)
+    finally:
+        drivetrain.velocity_tunables.close()
@@ -0,0 +1,94 @@
+import math
+import time
+
+from photonlibpy.photonCamera import PhotonCamera
+from wpilib.simulation import DriverStationSim
+from wpimath.geometry import Rotation3d, Transform3d, Translation3d
+
+from physics import PhysicsEngine
+import util
+
+
+def make_engine(
+    make_physics, left: float, right: float, camera: str = "sim"
+) -> PhysicsEngine:
+    """Returns a physics engine for a robot whose left and right motors are
+    set to the given outputs
+    """
+    motors = [util.WPI_TalonFX(i) for i in range(1, 5)]
+    for motor, output in zip(motors, (left, right, left, right)):
+        motor.set(output)
+    robot_to_camera = Transform3d(Translation3d(0.33, -0.03, 0), Rotation3d())
+    return make_physics(motors, camera, robot_to_camera)
+
+
+def enable():
+    DriverStationSim.setEnabled(True)
+    DriverStationSim.notifyNewData()
+
+
+def test_physics_drives_forward(make_physics):
+    enable()
+    # the right motors are inverted by their motor controller group
+    engine = make_engine(make_physics, 0.5, -0.5)
+    start = engine.start_pose
+    for _ in range(50):
+        engine.update_sim(0, 0.02)
+    # the robot starts facing -x
+    pose = engine.drivetrain.getPose()
+    assert pose.X() < start.X() - 1
+    assert math.isclose(pose.Y(), start.Y(), abs_tol=1e-6)
+
+
+def test_physics_gyro_follows_heading(make_physics):
+    enable()
+    # created before the engine, as `createObjects()` runs before physics
+    gyro = util.create_navx()
+    engine = make_engine(make_physics, 0.5, 0.5)
+    for _ in range(50):
+        engine.update_sim(0, 0.02)
+    turned = engine.drivetrain.getHeading() - engine.start_pose.rotation()
+    # continuous and clockwise positive
+    assert gyro.getAngle() > 10
+    assert math.isclose(
+        math.remainder(gyro.getAngle() + turned.degrees(), 360), 0, abs_tol=1e-6
+    )
+
+
+def test_camera_sees_speaker_tags(make_physics):
+    engine = make_engine(make_physics, 0, 0, camera="physics_test")
+    camera = PhotonCamera("physics_test")
+    engine.update_sim(1.0, 0.02)
+
+    result = camera.getLatestResult()
+    ids = sorted(target.getFiducialId() for target in result.getTargets())
+    assert ids == [7, 8]
+    assert math.isclose(result.getLatencyMillis(), engine.camera.latency * 1000)
+    # the robot is facing tag 7 head on
+    target = next(t for t in result.getTargets() if t.getFiducialId() == 7)
+    translation = target.getBestCameraToTarget().translation()
+    assert math.isclose(translation.X(), 2.5 - 0.33 + 0.0381, abs_tol=0.05)
+    assert abs(translation.Y()) < 0.1
+
+
+def test_camera_sees_nothing_facing_away(make_physics):
+    engine = make_engine(make_physics, 0.5, 0.5, camera="physics_test_away")
+    camera = PhotonCamera("physics_test_away")
+    enable()
+    # turn far enough that the speaker is out of view
+    for _ in range(25):
+        engine.update_sim(0, 0.02)
+    engine.update_sim(1.0, 0.02)
+    assert not camera.getLatestResult().hasTargets()
+
+
+def test_physics_full_match_uncapped(make_physics):
+    enable()
+    engine = make_engine(make_physics, 0.3, -0.2, camera="physics_test_match")
+    start = time.perf_counter()
+    # 150 simulated seconds, one update per 20 ms robot loop
+    for i in range(7500):
+        engine.update_sim(i * 0.02, 0.02)
+    # at least 20 times faster than real time
+    assert time.perf_counter() - start < 7.5
+    assert engine.camera.frames > 4000
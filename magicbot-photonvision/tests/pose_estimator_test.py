@@ -0,0 +1,78 @@
+import math
+from types import SimpleNamespace
+
+from wpilib import Timer
+from wpimath.geometry import Pose2d, Rotation2d
+
+from components.pose_estimator import PoseEstimator
+from components.vision import PoseEstimate
+
+
+def make_pose_estimator(
+    wheels: list, vision: list, headings: list = None
+) -> PoseEstimator:
+    """Returns a set up estimator whose wheel positions are read from
+    `wheels[0]`, vision estimate from `vision[0]` and counterclockwise gyro
+    heading in degrees from `headings[0]` (0 if not given)
+    """
+    headings = headings or [0.0]
+    pose_estimator = PoseEstimator()
+    pose_estimator.drivetrain = SimpleNamespace(get_wheel_positions=lambda: wheels[0])
+    pose_estimator.vision = SimpleNamespace(getPoseEstimate=lambda: vision[0])
+    pose_estimator.gyro = SimpleNamespace(
+        getRotation2d=lambda: Rotation2d.fromDegrees(headings[0])
+    )
+    pose_estimator.track_width = 0.5
+    pose_estimator.setup()
+    return pose_estimator
+
+
+def test_pose_estimator_reset_ignores_old_vision():
+    wheels = [(0.0, 0.0)]
+    vision = [
+        PoseEstimate(
+            Pose2d(3, 4, Rotation2d()),
+            Timer.getFPGATimestamp(),
+            0.0,
+            (0.01, 0.01, 0.01),
+            1,
+        )
+    ]
+    pose_estimator = make_pose_estimator(wheels, vision)
+
+    pose_estimator.execute()
+    assert pose_estimator.has_vision_fix()
+    assert pose_estimator.get_pose().X() > 1
+
+    # the camera still reports the same estimate after the reset
+    pose_estimator.reset_pose()
+    pose_estimator.execute()
+    assert not pose_estimator.has_vision_fix()
+    assert pose_estimator.get_pose().translation().norm() < 1e-9
+
+
+def test_pose_estimator_odometry():
+    wheels = [None]
+    headings = [0.0]
+    pose_estimator = make_pose_estimator(wheels, [None], headings)
+
+    # nothing is tracked until the drivetrain has wheel positions
+    pose_estimator.execute()
+    assert pose_estimator.estimator is None
+    assert pose_estimator.get_pose() == Pose2d()
+
+    wheels[0] = (0.5, 0.5)
+    pose_estimator.execute()
+    # drive 1m straight, then turn in place to 90 degrees
+    wheels[0] = (1.5, 1.5)
+    pose_estimator.execute()
+    wheels[0] = (1.3, 1.7)
+    headings[0] = 90.0
+    pose_estimator.execute()
+
+    pose = pose_estimator.get_pose()
+    assert math.isclose(pose.X(), 1.0, abs_tol=1e-6)
+    assert math.isclose(pose.Y(), 0.0, abs_tol=1e-6)
+    assert math.isclose(pose.rotation().degrees(), 90.0)
+    # cached until the next loop
+    assert pose_estimator.get_pose() is pose
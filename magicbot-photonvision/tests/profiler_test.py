@@ -0,0 +1,25 @@
+from profiler import LatencyHistogram, LoopProfiler
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram(budget=0.02, resolution=0.001, span=0.04)
+    for i in range(100):
+        histogram.add(0.0005 if i < 90 else 0.025)
+    assert histogram.percentile(50) == 0.001
+    assert histogram.percentile(99) == 0.025
+    assert histogram.max == 0.025
+    assert histogram.overruns == 10
+
+
+def test_histogram_overflow():
+    histogram = LatencyHistogram(budget=0.02, resolution=0.001, span=0.04)
+    histogram.add(1.0)
+    assert histogram.percentile(50) == 1.0
+    assert len(histogram.buckets) == 41
+
+
+def test_profiler_wrap():
+    profiler = LoopProfiler(0.02)
+    wrapped = profiler.wrap("f", lambda x: x + 1)
+    assert wrapped(1) == 2
+    assert profiler.histograms["f"].count == 1
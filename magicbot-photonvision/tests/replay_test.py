@@ -0,0 +1,161 @@
+from types import SimpleNamespace
+
+import numpy as np
+from wpilib import Timer
+from wpilib.simulation import pauseTiming, resumeTiming, stepTiming
+from wpiutil.log import DataLog
+
+from components.data_logger import DataLogger
+from data_logger_test import read_values
+import replay
+
+
+def make_recording(n: int, trigger: bool, vision=()) -> replay.Recording:
+    times = 100 + 0.02 * np.arange(n)
+    return replay.Recording(
+        times,
+        angle=np.zeros(n),
+        rate=np.zeros(n),
+        joystick_x=np.linspace(-1, 1, n),
+        joystick_y=np.linspace(1, -1, n),
+        joystick_trigger=np.full(n, trigger),
+        vision_times=[times[0]] if vision else [],
+        vision=[vision] if vision else [],
+    )
+
+
+def test_replay_teleop_commands():
+    recording = make_recording(50, trigger=False)
+    commands = replay.replay(recording)
+    curve = replay.robot.util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1)
+    expected = [
+        (curve(y), -curve(x))
+        for x, y in zip(recording.joystick_x, recording.joystick_y)
+    ]
+    # the commands are rate limited, but the ramps are slow enough to follow
+    # once they have caught up from 0
+    assert np.all(np.abs(np.diff(commands, axis=0)) <= np.array([0.04, 0.08]) + 1e-9)
+    np.testing.assert_allclose(commands[-20:], expected[-20:], atol=1e-3)
+
+
+def test_replay_precision_mode():
+    n = 80
+    recording = replay.Recording(
+        100 + 0.02 * np.arange(n),
+        angle=np.zeros(n),
+        rate=np.zeros(n),
+        joystick_x=np.zeros(n),
+        joystick_y=np.full(n, 0.8),
+        joystick_trigger=np.zeros(n),
+        # held from halfway through
+        joystick_precision=np.arange(n) >= n // 2,
+    )
+    commands = replay.replay(recording)
+    full = replay.robot.util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1)(0.8)
+    assert np.isclose(commands[n // 2 - 1, 0], full)
+    assert np.isclose(commands[-1, 0], full / 2)
+
+
+def test_replay_skips_autonomous():
+    recording = make_recording(50, trigger=False)
+    recording.teleop[:20] = False
+    commands = replay.replay(recording)
+    assert np.all(np.isnan(commands[:20]))
+    # teleop starts from rest, as if the autonomous loops were not recorded,
+    # though the rate limiters catch up sooner after the time spent in them
+    teleop = replay.Recording(
+        recording.times[20:],
+        recording.angle[20:],
+        recording.rate[20:],
+        recording.joystick_x[20:],
+        recording.joystick_y[20:],
+        recording.joystick_trigger[20:],
+    )
+    np.testing.assert_allclose(commands[23:], replay.replay(teleop)[3:])
+
+
+def test_replay_follow_tag_with_tunables():
+    # tag 2m ahead and 0.5m to the left, seen on the first loop
+    vision = [1, 3, 2.0, 0.5, 0.0, -14.0, 0.02, 99.99]
+    recording = make_recording(20, trigger=True, vision=vision)
+    commands = replay.replay(recording)
+    assert commands[0].tolist() == [0, 0]
+    # saturated distance P controller, and turning left (negative gyro angle)
+    assert np.all(commands[2:, 0] == -0.3)
+    assert np.all(commands[2:, 1] > 0)
+
+    faster = replay.replay(recording, {"turn_to_angle_kP": 0.05})
+    assert np.all(np.abs(faster[2:, 1]) >= np.abs(commands[2:, 1]))
+
+
+def test_replay_vision_logged_late_in_loop():
+    vision = [1, 3, 2.0, 0.5, 0.0, -14.0, 0.02, 99.99]
+    recording = make_recording(5, trigger=True, vision=vision)
+    # the logger records vision after the gyro within a loop
+    recording.vision_times += 0.005
+    commands = replay.replay(recording)
+    assert commands[0].tolist() == [0, 0]
+    assert commands[1, 0] == -0.3
+
+
+def record(path, loops: int, tag_loop: int) -> np.ndarray:
+    """Runs the replay harness live in robot loop order, with a tag seen
+    from `tag_loop` on, logging it through `DataLogger` to `path`. Returns
+    the commands given each loop.
+    """
+    log = DataLog(str(path.parent), path.name, period=0.01)
+    harness = replay.ReplayRobot(0.0)
+    drivetrain = harness.drivetrain
+    motor = SimpleNamespace(get=lambda: 0.0)
+    drivetrain.front_left_motor = drivetrain.front_right_motor = motor
+    drivetrain.back_left_motor = drivetrain.back_right_motor = motor
+    logger = DataLogger()
+    logger.drivetrain = drivetrain
+    logger.vision = harness.vision
+    logger.gyro = harness.gyro
+    logger.joystick = harness.joystick
+    logger.enabled = True
+    logger.precision_button = replay.robot.precision_button
+    logger.log = log
+    logger.setup()
+
+    commands = np.zeros((loops, 2))
+    pauseTiming()
+    try:
+        for i in range(loops):
+            harness.gyro.angle = -0.5 * i
+            harness.joystick.trigger = True
+            harness.joystick.precision = i % 10 < 5
+            harness.teleopPeriodic()
+            harness.drive_control.execute()
+            if i >= tag_loop:
+                # tag 2m ahead and 0.5m to the left, drifting to the right
+                timestamp = Timer.getFPGATimestamp() - 0.02
+                harness.vision.set_snapshot(
+                    [1, 3, 2.0, 0.5 - 0.05 * i, 0.0, -14.0, 0.02, timestamp]
+                )
+            logger.execute()
+            commands[i] = drivetrain.forward, drivetrain.turn
+            drivetrain.stop()
+            stepTiming(0.02)
+    finally:
+        resumeTiming()
+        harness.close()
+    read_values(log, path, loops)
+    return commands
+
+
+def test_replay_data_logger_recording(tmp_path):
+    path = tmp_path / "recording.wpilog"
+    recorded = record(path, loops=30, tag_loop=10)
+    recording = replay.Recording.load(path)
+    assert len(recording) == 30
+    assert list(recording.joystick_precision) == [i % 10 < 5 for i in range(30)]
+    np.testing.assert_allclose(recording.commands, recorded)
+
+    commands = replay.replay(recording)
+    # the tag is first acted on in the loop after it was seen
+    assert np.all(commands[:11] == 0)
+    assert np.all(commands[11:, 0] != 0)
+    # logged timestamps are rounded to microseconds
+    np.testing.assert_allclose(commands, recorded, atol=1e-4)
@@ -0,0 +1,46 @@
+from ntcore import NetworkTableInstance
+from wpilib.simulation import pauseTiming, resumeTiming, stepTiming
+
+from telemetry import TelemetryPublisher
+
+
+def test_per_key_rate_limits():
+    calls = {"fast": 0, "slow": 0}
+
+    def getter(key):
+        def get():
+            calls[key] += 1
+            return float(calls[key])
+
+        return get
+
+    pauseTiming()
+    try:
+        publisher = TelemetryPublisher("telemetry_test", period=0.1)
+        publisher.add("fast", getter("fast"), period=0.02)
+        publisher.add("slow", getter("slow"))
+        for _ in range(50):
+            publisher.update()
+            stepTiming(0.02)
+    finally:
+        resumeTiming()
+
+    assert calls["fast"] == 50
+    assert calls["slow"] == 10
+    assert publisher.values == {"fast": 50.0, "slow": 10.0}
+    table = NetworkTableInstance.getDefault().getTable("telemetry_test")
+    assert table.getEntry("slow").getDouble(0) == 10.0
+
+
+def test_add_methods_uses_feedback_names():
+    class Robot:
+        def get_angle(self):
+            return 1.5
+
+        def speed(self):
+            return 2.5
+
+    publisher = TelemetryPublisher("telemetry_test")
+    publisher.add_methods(Robot(), ("get_angle", "speed"))
+    publisher.update()
+    assert publisher.values == {"angle": 1.5, "speed": 2.5}
@@ -0,0 +1,228 @@
+import math
+import time
+
+import numpy as np
+import pytest
+from magicbot import tunable
+from magicbot.magic_tunable import setup_tunables
+from phoenix6.configs import CurrentLimitsConfigs
+from phoenix6.signals import NeutralModeValue
+from phoenix6.status_code import StatusCode
+from wpilib.simulation import pauseTiming, resumeTiming, stepTimingAsync
+
+import util
+
+
+def sample_inputs(n: int = 20001):
+    return [-1.2 + 2.4 * i / (n - 1) for i in range(n)]
+
+
+def test_compiled_curve_accuracy():
+    """The compiled curves must stay within the bound documented in
+    `util.curve` (M * h**2 / 8 with h = 2 / 1024, M = 6 for a cubic)
+    """
+    pairs = [
+        (util.linear_curve, 1e-12),
+        (util.ollie_curve, 2 * (2 / 1024) ** 2 / 8),
+        (util.cubic_curve, 6 * (2 / 1024) ** 2 / 8),
+    ]
+    for make_curve, bound in pairs:
+        exact = make_curve(offset=0.05, deadband=0.1)
+        compiled = make_curve(offset=0.05, deadband=0.1, compiled=True)
+        for x in sample_inputs():
+            assert abs(compiled(x) - exact(x)) <= bound + 1e-12, (make_curve, x)
+
+
+def test_compiled_curve_deadband_and_clamp():
+    exact = util.linear_curve(scalar=2, deadband=0.1, max_mag=1)
+    compiled = util.linear_curve(scalar=2, deadband=0.1, max_mag=1, compiled=True)
+    for x in (-1.0, -0.7, -0.1, -0.0999, 0.0, 0.0999, 0.1, 0.5, 1.0):
+        assert abs(compiled(x) - exact(x)) < 1e-12
+
+
+def test_curve_array_matches_scalar():
+    inputs = np.array(sample_inputs() + [-0.1, 0.1, 0.0])
+    for make_curve in (util.linear_curve, util.ollie_curve, util.cubic_curve):
+        f = make_curve(scalar=1.5, offset=0.05, deadband=0.1, max_mag=1)
+        expected = np.array([f(x) for x in inputs])
+        assert np.allclose(f.array(inputs), expected, rtol=0, atol=1e-12)
+
+
+def test_curve_array_scalar_fallback():
+    """Mappings that can't take an array are applied to each element"""
+    inputs = np.array(sample_inputs(101))
+    for mapping in (math.sin, lambda x: x if x > 0 else x / 2):
+        f = util.curve(mapping, 0.05, 0.1, 1)
+        assert np.array_equal(f.array(inputs), [f(x) for x in inputs])
+
+
+def test_input_shaper():
+    stick = {"x": 1.0, "y": 0.05}
+    precision = [False]
+    shaper = (
+        util.InputShaper(lambda: precision[0], precision_scale=0.5)
+        .add_axis(lambda: stick["x"], util.linear_curve(deadband=0.1), rate_limit=2.0)
+        .add_axis(lambda: stick["y"], util.linear_curve(deadband=0.1), invert=True)
+    )
+    outputs = shaper.outputs
+    pauseTiming()
+    try:
+        shaper.reset()
+        for _ in range(10):
+            stepTimingAsync(0.02)
+            assert shaper.update() is outputs
+        # ramped up from 0 at 2 per second; y is within the deadband
+        assert outputs == pytest.approx([0.4, 0.0])
+        for _ in range(20):
+            stepTimingAsync(0.02)
+            shaper.update()
+        assert outputs == pytest.approx([1.0, 0.0])
+
+        stick["y"] = 0.5
+        precision[0] = True
+        stepTimingAsync(0.02)
+        shaper.update()
+        assert outputs == pytest.approx([0.96, -0.25])
+    finally:
+        resumeTiming()
+
+
+def test_talon_fx_dedupe():
+    motor = util.WPI_TalonFX(1, dedupe=True, keep_alive=1000)
+    for _ in range(10):
+        motor.set(0.5)
+    motor.set(0.25)
+    motor.setVoltage(3)
+    motor.setVoltage(3)
+    assert motor.frames_sent == 3
+    assert motor.frames_skipped == 10
+
+
+def test_talon_fx_velocity_dedupe():
+    motor = util.WPI_TalonFX(4, dedupe=True, keep_alive=1000)
+    for _ in range(5):
+        motor.set_velocity(20, 1.5)
+    motor.set_velocity(20, 2.0)
+    motor.set(0)
+    assert motor.frames_sent == 3
+    assert motor.frames_skipped == 4
+    assert motor.request is motor.duty_cycle_out
+
+
+def test_talon_fx_set_position():
+    motor = util.WPI_TalonFX(5, dedupe=True, keep_alive=1000)
+    motor.set_motion_magic(40, 120)
+    motor.set_position_gains(4, kd=0.1, kv=0.12)
+    for _ in range(5):
+        motor.set_position(10)
+    assert motor.request is motor.motion_magic_voltage
+    assert motor.request.slot == 1
+    assert motor.frames_sent == 1
+    assert motor.config.slot1.k_p == 4
+
+
+def test_talon_fx_deferred_config():
+    motors = [util.WPI_TalonFX(2), util.WPI_TalonFX(3)]
+    with util.deferred_config(*motors):
+        for motor in motors:
+            motor.setInverted(True)
+            motor.setIdleMode(NeutralModeValue.BRAKE)
+        # both setters change the same sub-config, which is staged once
+        for motor in motors:
+            assert list(motor._dirty_configs.values()) == [motor.config.motor_output]
+    assert not any(motor._dirty_configs for motor in motors)
+
+
+def test_talon_fx_gains_keep_other_settings():
+    motor = util.WPI_TalonFX(41)
+    # set outside of `config`, eg. by Phoenix Tuner
+    limits = CurrentLimitsConfigs()
+    limits.supply_current_limit = 35
+    limits.supply_current_limit_enable = True
+    assert motor.configurator.apply(limits, 1.0).is_ok()
+
+    with util.deferred_config(motor):
+        motor.set_velocity_gains(0.3)
+    motor.set_velocity_gains(0.4)
+
+    applied = CurrentLimitsConfigs()
+    assert motor.configurator.refresh(applied, 1.0).is_ok()
+    assert applied.supply_current_limit == 35
+    assert applied.supply_current_limit_enable
+
+
+def test_talon_fx_deferred_config_failure():
+    motor = util.WPI_TalonFX(6)
+    # phoenix6 rejects a timeout of 0 for blocking operations
+    with pytest.raises(Exception, match="6: TIMEOUT_CANNOT_BE_ZERO"):
+        with util.deferred_config(motor, timeout=0):
+            motor.setInverted(True)
+    assert motor._dirty_configs
+    assert util.flush_configs([motor]) == [StatusCode.OK]
+    assert not motor._dirty_configs
+
+
+class TunedComponent:
+    kP = tunable(1.0)
+    kD = tunable(0.0)
+
+
+def test_talon_fx_telemetry():
+    motors = [util.WPI_TalonFX(id) for id in range(56, 60)]
+    telemetry = util.TalonFXTelemetry(motors)
+    positions = [1.0, -2.0, 3.0, -4.0]
+    velocities = [10.0, -20.0, 30.0, -40.0]
+    for motor, position in zip(motors, positions):
+        motor.sim_state.set_raw_rotor_position(position)
+        motor.sim_state.set_rotor_velocity(0)
+    # wait for the simulated motors to report their new state
+    for _ in range(100):
+        snapshot = telemetry.refresh()
+        if [motor.position for motor in snapshot.motors] == positions:
+            break
+        time.sleep(0.01)
+    assert telemetry.snapshot is snapshot
+    # in the order the motors were given, with their signs
+    assert [motor.position for motor in snapshot.motors] == positions
+    assert [motor.velocity for motor in snapshot.motors] == [0.0] * 4
+
+    for motor, velocity in zip(motors, velocities):
+        motor.sim_state.set_rotor_velocity(velocity)
+    for _ in range(100):
+        snapshot = telemetry.refresh()
+        if [motor.velocity for motor in snapshot.motors] == velocities:
+            break
+        time.sleep(0.01)
+    assert [motor.velocity for motor in snapshot.motors] == velocities
+    # positions are latency compensated along the velocities
+    for motor, position, velocity in zip(snapshot.motors, positions, velocities):
+        assert (motor.position - position) * velocity >= 0
+
+
+def test_tunable_binding():
+    component = TunedComponent()
+    setup_tunables(component, "util_test")
+    applied = []
+    binding = util.TunableBinding(
+        component, ("kP", "kD"), lambda: applied.append(component.kP)
+    )
+    try:
+        # applied once on the first update, then only after a change
+        binding.update()
+        binding.update()
+        assert applied == [1.0]
+
+        component.kP = 2.0
+        # wait for the networktables listener to see the edit
+        deadline = time.monotonic() + 1.0
+        while not binding._dirty and time.monotonic() < deadline:
+            time.sleep(0.001)
+        binding.update()
+        binding.update()
+        assert applied == [1.0, 2.0]
+    finally:
+        binding.close()
+        component.kP = 1.0
+    time.sleep(0.05)
+    binding.update()
+    assert applied == [1.0, 2.0]
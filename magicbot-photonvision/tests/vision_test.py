@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from types import SimpleNamespace
+
+from ntcore import NetworkTableInstance
+from photonlibpy.photonPipelineResult import PhotonPipelineResult
+from photonlibpy.photonTrackedTarget import PhotonTrackedTarget
+from robotpy_apriltag import AprilTag, AprilTagFieldLayout
+from wpilib import Timer
+from wpilib.simulation import pauseTiming, resumeTiming, stepTiming
+from wpimath.geometry import Pose3d, Rotation3d, Transform3d, Translation3d
+
+from components.vision import TagPoseEstimator, Vision
+
+
+# the camera 0.5m in front of the robot's center
+robot_to_camera = Transform3d(Translation3d(0.5, 0, 0), Rotation3d())
+
+
+def make_field_layout() -> AprilTagFieldLayout:
+    """Returns a field with only tag 3, at (5, 2) facing back along the x axis"""
+    tag = AprilTag()
+    tag.ID = 3
+    tag.pose = Pose3d(5, 2, 0.5, Rotation3d(0, 0, math.pi))
+    return AprilTagFieldLayout([tag], 16.5, 8.2)
+
+
+def make_vision(
+    results: list, background_ingest: bool = False, estimate_pose: bool = False
+) -> Vision:
+    vision = Vision()
+    vision.camera = SimpleNamespace(
+        getLatestResult=lambda: results[-1], getName=lambda: "vision_test"
+    )
+    vision.filter_window = 3
+    vision.background_ingest = background_ingest
+    vision.estimate_pose = estimate_pose
+    vision.field_layout = make_field_layout()
+    vision.robot_to_camera = robot_to_camera
+    vision.setup()
+    return vision
+
+
+def make_result(timestamp: float, x: float = None, y: float = 0.0, id: int = 3):
+    targets = []
+    if x is not None:
+        transform = Transform3d(Translation3d(x, y, 0.5), Rotation3d())
+        targets.append(
+            PhotonTrackedTarget(
+                fiducialId=id, bestCameraToTarget=transform, poseAmbiguity=0.1
+            )
+        )
+    return PhotonPipelineResult(20.0, timestamp, targets)
+
+
+def test_snapshot_updated_in_place():
+    results = [make_result(1.0, x=2.0, y=-2.0)]
+    vision = make_vision(results)
+    snapshot = vision.getSnapshot()
+    assert not snapshot.valid
+
+    vision.execute()
+    assert vision.getSnapshot() is snapshot
+    assert snapshot.valid
+    assert snapshot.id == 3
+    assert snapshot.timestamp == 1.0
+    assert math.isclose(snapshot.latency, 0.02)
+    assert (snapshot.x, snapshot.y, snapshot.z) == (2.0, -2.0, 0.5)
+    assert math.isclose(snapshot.heading, 45)
+    assert vision.getX() == snapshot.x
+
+
+def test_snapshot_invalid_after_drought():
+    results = [make_result(1.0, x=2.0)]
+    vision = make_vision(results)
+    vision.execute()
+    for i in range(vision.filter_window):
+        assert vision.getSnapshot().valid
+        results.append(make_result(2.0 + i))
+        vision.execute()
+    assert not vision.getSnapshot().valid
+    assert vision.getX() is None
+
+
+def test_repeated_result_not_read_again():
+    results = [make_result(1.0, x=2.0)]
+    vision = make_vision(results, estimate_pose=True)
+    estimates = []
+    estimate = vision.estimator.estimate
+
+    def counting_estimate(result):
+        estimates.append(result)
+        return estimate(result)
+
+    vision.estimator.estimate = counting_estimate
+    for _ in range(3):
+        vision.execute()
+    assert len(estimates) == 1
+    assert vision.sequence == 1
+
+    results.append(make_result(2.0, x=2.0))
+    vision.execute()
+    assert len(estimates) == 2
+    assert vision.getPoseEstimate().timestamp == 2.0
+
+
+def test_tag_pose_estimate_from_known_tag():
+    estimator = TagPoseEstimator(make_field_layout(), robot_to_camera)
+    # the tag 2m straight ahead of the camera, facing it
+    target = PhotonTrackedTarget(
+        fiducialId=3,
+        bestCameraToTarget=Transform3d(
+            Translation3d(2, 0, 0), Rotation3d(0, 0, math.pi)
+        ),
+        poseAmbiguity=0.1,
+    )
+    estimate = estimator.estimate(PhotonPipelineResult(20.0, 1.5, [target]))
+
+    assert math.isclose(estimate.pose.X(), 2.5, abs_tol=1e-9)
+    assert math.isclose(estimate.pose.Y(), 2.0, abs_tol=1e-9)
+    assert math.isclose(estimate.pose.rotation().radians(), 0, abs_tol=1e-9)
+    assert estimate.timestamp == 1.5
+    assert math.isclose(estimate.ambiguity, 0.1)
+    assert estimate.tag_count == 1
+    # base standard deviations scaled by 1 + distance squared
+    for std_dev, expected in zip(estimate.std_devs, (0.5, 0.5, 1.0)):
+        assert math.isclose(std_dev, expected)
+
+
+def test_tag_pose_estimate_ignores_unknown_and_ambiguous_tags():
+    estimator = TagPoseEstimator(make_field_layout(), robot_to_camera)
+    transform = Transform3d(Translation3d(2, 0, 0), Rotation3d(0, 0, math.pi))
+    unknown = PhotonTrackedTarget(
+        fiducialId=4, bestCameraToTarget=transform, poseAmbiguity=0.1
+    )
+    ambiguous = PhotonTrackedTarget(
+        fiducialId=3, bestCameraToTarget=transform, poseAmbiguity=0.5
+    )
+    assert estimator.estimate(PhotonPipelineResult(20.0, 1.5, [unknown])) is None
+    assert estimator.estimate(PhotonPipelineResult(20.0, 1.5, [ambiguous])) is None
+
+
+def publish(vision: Vision, publisher, value: bytes):
+    """Publishes a new camera result and waits for `vision`'s listener to
+    read it
+    """
+    frame = vision._latest_frame
+    publisher.set(value)
+    deadline = time.monotonic() + 1.0
+    while vision._latest_frame is frame and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def make_publisher():
+    return (
+        NetworkTableInstance.getDefault()
+        .getRawTopic("/photonvision/vision_test/rawBytes")
+        .publish("rawBytes")
+    )
+
+
+def test_background_ingest_reads_camera_on_listener_thread():
+    results = [make_result(1.0, x=2.0)]
+    vision = make_vision(results, background_ingest=True)
+    threads = []
+
+    def get_latest_result():
+        threads.append(threading.get_ident())
+        return results[-1]
+
+    vision.camera.getLatestResult = get_latest_result
+    publisher = make_publisher()
+    try:
+        publish(vision, publisher, b"1")
+        assert len(threads) == 1
+        assert threads[0] != threading.get_ident()
+
+        # execute() only takes the frame the listener has read
+        for _ in range(3):
+            vision.execute()
+        assert len(threads) == 1
+        assert vision.sequence == 1
+        assert vision.getSnapshot().valid
+        assert vision.getSnapshot().x == 2.0
+    finally:
+        NetworkTableInstance.getDefault().removeListener(vision._listener)
+        publisher.close()
+
+
+def test_background_ingest_sequence_and_age():
+    results = [make_result(1.0, x=2.0)]
+    vision = make_vision(results, background_ingest=True, estimate_pose=True)
+    publisher = make_publisher()
+    pauseTiming()
+    try:
+        # nothing is read until the listener has been called
+        vision.execute()
+        assert vision.sequence == 0
+        assert vision.getTimestamp() is None
+        assert vision.getPoseEstimate() is None
+
+        publish(vision, publisher, b"1")
+        vision.execute()
+        assert vision.sequence == 1
+        assert vision.getTimestamp() == 1.0
+        assert vision.getPoseEstimate().timestamp == 1.0
+        age = Timer.getFPGATimestamp() - 1.0
+        assert vision.getFrameAge() == age
+
+        # the same frame is not counted again as it ages
+        stepTiming(0.1)
+        vision.execute()
+        assert vision.sequence == 1
+        assert math.isclose(vision.getFrameAge(), age + 0.1)
+
+        results.append(make_result(2.0, x=2.0))
+        publish(vision, publisher, b"2")
+        vision.execute()
+        assert vision.sequence == 2
+        assert vision.getTimestamp() == 2.0
+        assert vision.getPoseEstimate().timestamp == 2.0
+    finally:
+        resumeTiming()
+        NetworkTableInstance.getDefault().removeListener(vision._listener)
+        publisher.close()
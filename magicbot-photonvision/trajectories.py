@@ -0,0 +1,65 @@
+"""Paths followed by the autonomous modes, in blue alliance field
+coordinates. Trajectories are generated from these once, when the robot
+starts, so autonomous only has to sample them.
+
+wpimath generates trajectories in C++ at a few microseconds per state, which
+is faster than the states could be read back from a file and rebuilt in
+Python, so they are not cached between boots.
+"""
+
+from collections import namedtuple
+
+from wpimath.controller import SimpleMotorFeedforwardMeters
+from wpimath.geometry import Pose2d, Rotation2d
+from wpimath.kinematics import DifferentialDriveKinematics
+from wpimath.trajectory import Trajectory, TrajectoryConfig, TrajectoryGenerator
+from wpimath.trajectory.constraint import DifferentialDriveVoltageConstraint
+
+from config import TrajectoryConstraints
+
+
+# `waypoints` are poses the robot passes through; if `reversed` is True the
+# robot drives backwards along them
+Path = namedtuple("Path", "waypoints reversed")
+
+# in front of the speaker, facing the tags on it
+speaker_pose = Pose2d(2.5, 5.55, Rotation2d.fromDegrees(180))
+amp_note_pose = Pose2d(4.5, 6.7, Rotation2d.fromDegrees(180))
+
+paths = {
+    "leave_speaker": Path([speaker_pose, amp_note_pose], reversed=True),
+    "return_to_speaker": Path([amp_note_pose, speaker_pose], reversed=False),
+}
+
+
+def make_trajectory_config(
+    constraints: TrajectoryConstraints,
+    kinematics: DifferentialDriveKinematics,
+    feedforward: SimpleMotorFeedforwardMeters,
+) -> TrajectoryConfig:
+    """Returns a trajectory config that keeps each side's wheels within the
+    limits in `constraints`
+    """
+    config = TrajectoryConfig(constraints.max_velocity, constraints.max_acceleration)
+    config.setKinematics(kinematics)
+    config.addConstraint(
+        DifferentialDriveVoltageConstraint(
+            feedforward, kinematics, constraints.max_voltage
+        )
+    )
+    return config
+
+
+def generate(path: Path, config: TrajectoryConfig) -> Trajectory:
+    config.setReversed(path.reversed)
+    return TrajectoryGenerator.generateTrajectory(path.waypoints, config)
+
+
+def generate_all(
+    constraints: TrajectoryConstraints,
+    kinematics: DifferentialDriveKinematics,
+    feedforward: SimpleMotorFeedforwardMeters,
+) -> dict[str, Trajectory]:
+    """Returns a trajectory for every path in `paths`, by name"""
+    config = make_trajectory_config(constraints, kinematics, feedforward)
+    return {name: generate(path, config) for name, path in paths.items()}
@@ -105,10 +105,18 @@ class MyRobot(wpilib.TimedRobot):
             self.rearRightMotor.set_control(Follower(current_ids["front_right"], False))
 
         self.xbox = wpilib.XboxController(0)
-        self.curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1)
+        # half speed while the right bumper is held, and ramped to avoid
+        # current spikes
+        curve = util.linear_curve(scalar=0.5, deadband=0.1, max_mag=1, compiled=True)
+        self.drive_inputs = (
+            util.InputShaper(self.xbox.getRightBumper)
+            .add_axis(self.xbox.getLeftY, curve, rate_limit=2.0)
+            .add_axis(self.xbox.getLeftX, curve, rate_limit=4.0, invert=True)
+        )
 
     def teleopInit(self):
         """Executed at the start of teleop mode"""
+        self.drive_inputs.reset()
         if current_ids["controller_type"] == "spark_max":
             self.myRobot.setSafetyEnabled(True)
 
@@ -121,8 +129,7 @@ class MyRobot(wpilib.TimedRobot):
         an inverse kinematics function and then manually fed into the
         leader motors.
         """
-        forward = self.curve(self.xbox.getLeftY())
-        turn = -self.curve(self.xbox.getLeftX())
+        forward, turn = self.drive_inputs.update()
         if current_ids["controller_type"] == "spark_max":
             self.myRobot.arcadeDrive(forward, turn)
         elif current_ids["controller_type"] == "talon":
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+import pytest
+from wpilib.simulation import pauseTiming, resumeTiming, stepTimingAsync
+
+import util
+
+
+def sample_inputs(n: int = 20001):
+    return [-1.2 + 2.4 * i / (n - 1) for i in range(n)]
+
+
+def test_compiled_curve_accuracy():
+    """The compiled curves must stay within the bound documented in
+    `util.curve` (M * h**2 / 8 with h = 2 / 1024, M = 6 for a cubic)
+    """
+    pairs = [
+        (util.linear_curve, 1e-12),
+        (util.ollie_curve, 2 * (2 / 1024) ** 2 / 8),
+        (util.cubic_curve, 6 * (2 / 1024) ** 2 / 8),
+    ]
+    for make_curve, bound in pairs:
+        exact = make_curve(offset=0.05, deadband=0.1)
+        compiled = make_curve(offset=0.05, deadband=0.1, compiled=True)
+        for x in sample_inputs():
+            assert abs(compiled(x) - exact(x)) <= bound + 1e-12, (make_curve, x)
+
+
+def test_compiled_curve_deadband_and_clamp():
+    exact = util.linear_curve(scalar=2, deadband=0.1, max_mag=1)
+    compiled = util.linear_curve(scalar=2, deadband=0.1, max_mag=1, compiled=True)
+    for x in (-1.0, -0.7, -0.1, -0.0999, 0.0, 0.0999, 0.1, 0.5, 1.0):
+        assert abs(compiled(x) - exact(x)) < 1e-12
+
+
+def test_curve_array_matches_scalar():
+    inputs = np.array(sample_inputs() + [-0.1, 0.1, 0.0])
+    for make_curve in (util.linear_curve, util.ollie_curve, util.cubic_curve):
+        f = make_curve(scalar=1.5, offset=0.05, deadband=0.1, max_mag=1)
+        expected = np.array([f(x) for x in inputs])
+        assert np.allclose(f.array(inputs), expected, rtol=0, atol=1e-12)
+
+
+def test_curve_array_scalar_fallback():
+    """Mappings that can't take an array are applied to each element"""
+    inputs = np.array(sample_inputs(101))
+    for mapping in (math.sin, lambda x: x if x > 0 else x / 2):
+        f = util.curve(mapping, 0.05, 0.1, 1)
+        assert np.array_equal(f.array(inputs), [f(x) for x in inputs])
+
+
+def test_input_shaper():
+    stick = {"x": 1.0, "y": 0.05}
+    precision = [False]
+    shaper = (
+        util.InputShaper(lambda: precision[0], precision_scale=0.5)
+        .add_axis(lambda: stick["x"], util.linear_curve(deadband=0.1), rate_limit=2.0)
+        .add_axis(lambda: stick["y"], util.linear_curve(deadband=0.1), invert=True)
+    )
+    outputs = shaper.outputs
+    pauseTiming()
+    try:
+        shaper.reset()
+        for _ in range(10):
+            stepTimingAsync(0.02)
+            assert shaper.update() is outputs
+        # ramped up from 0 at 2 per second; y is within the deadband
+        assert outputs == pytest.approx([0.4, 0.0])
+        for _ in range(20):
+            stepTimingAsync(0.02)
+            shaper.update()
+        assert outputs == pytest.approx([1.0, 0.0])
+
+        stick["y"] = 0.5
+        precision[0] = True
+        stepTimingAsync(0.02)
+        shaper.update()
+        assert outputs == pytest.approx([0.96, -0.25])
+    finally:
+        resumeTiming()
@@ -1,5 +1,9 @@
 from typing import Callable
 
+import numpy as np
+
+from wpimath.filter import SlewRateLimiter
+
 
 def clamp(value: float, min_value: float, max_value: float) -> float:
     """Restrict value between min_value and max_value."""
@@ -7,7 +11,12 @@ def clamp(value: float, min_value: float, max_value: float) -> float:
 
 
 def curve(
-    mapping: Callable[[float], float], offset: float, deadband: float, max_mag: float
+    mapping: Callable[[float], float],
+    offset: float,
+    deadband: float,
+    max_mag: float,
+    compiled: bool = False,
+    table_size: int = 1024,
 ) -> Callable[[float], float]:
     """Return a function that applies a curve to an input.
 
@@ -18,6 +27,18 @@ def curve(
         the input is treated as zero
     max_mag -- restricts the output magnitude to a maximum.
         If this is 0, no restriction is applied.
+    compiled -- if True, the curve is sampled into a lookup table over
+        [-1, 1] when it is built and calls interpolate between entries
+        instead of calling `mapping`. Inputs outside [-1, 1] fall back to
+        the exact curve.
+    table_size -- number of intervals in the lookup table. The error of a
+        compiled curve is at most M * h**2 / 8, where h = 2 / table_size
+        and M bounds the magnitude of the second derivative of `mapping`
+        (plus h / 4 times any change in slope from clamping).
+
+    The returned function also has an `array` attribute, which applies the
+    exact curve to every element of a numpy array at once (useful when
+    replaying logged inputs).
     """
 
     def f(input_val: float) -> float:
@@ -30,7 +51,45 @@ def curve(
         else:
             return clamp(output_val, -max_mag, max_mag)
 
-    return f
+    def f_array(input_vals: np.ndarray) -> np.ndarray:
+        """Apply a curve to every element of an array"""
+        input_vals = np.asarray(input_vals, dtype=float)
+        try:
+            mapped = mapping(input_vals)
+        except (TypeError, ValueError):
+            # mapping uses functions (eg. from `math`) that only take scalars,
+            # or branches on its input
+            mapped = np.vectorize(mapping, otypes=[float])(input_vals)
+        output_vals = mapped + offset
+        if max_mag != 0:
+            output_vals = np.clip(output_vals, -max_mag, max_mag)
+        return np.where(np.abs(input_vals) < deadband, offset, output_vals)
+
+    f.array = f_array
+    if not compiled:
+        return f
+
+    # the deadband is kept as a comparison rather than sampled into the
+    # table so that the jump at its edge is reproduced exactly
+    exact = curve(mapping, offset, 0, max_mag)
+    step = 2 / table_size
+    points = [exact(-1 + i * step) for i in range(table_size + 1)]
+    values = points[:-1]
+    slopes = [b - a for a, b in zip(points, points[1:])]
+    scale = table_size / 2
+
+    def compiled_f(input_val: float) -> float:
+        """Apply a curve to an input using the lookup table"""
+        if -deadband < input_val < deadband:
+            return offset
+        position = (input_val + 1) * scale
+        if 0 <= position < table_size:
+            i = int(position)
+            return values[i] + slopes[i] * (position - i)
+        return f(input_val)
+
+    compiled_f.array = f_array
+    return compiled_f
 
 
 def linear_curve(
@@ -38,8 +97,9 @@ def linear_curve(
     offset: float = 0.0,
     deadband: float = 0.0,
     max_mag: float = 0.0,
+    compiled: bool = False,
 ) -> Callable[[float], float]:
-    return curve(lambda x: scalar * x, offset, deadband, max_mag)
+    return curve(lambda x: scalar * x, offset, deadband, max_mag, compiled)
 
 
 def ollie_curve(
@@ -47,8 +107,9 @@ def ollie_curve(
     offset: float = 0.0,
     deadband: float = 0.0,
     max_mag: float = 0.0,
+    compiled: bool = False,
 ) -> Callable[[float], float]:
-    return curve(lambda x: scalar * x * abs(x), offset, deadband, max_mag)
+    return curve(lambda x: scalar * x * abs(x), offset, deadband, max_mag, compiled)
 
 
 def cubic_curve(
@@ -56,5 +117,80 @@ def cubic_curve(
     offset: float = 0.0,
     deadband: float = 0.0,
     max_mag: float = 0.0,
+    compiled: bool = False,
 ) -> Callable[[float], float]:
-    return curve(lambda x: scalar * x**3, offset, deadband, max_mag)
+    return curve(lambda x: scalar * x**3, offset, deadband, max_mag, compiled)
+
+
+class InputShaper:
+    """Shapes driver inputs for one loop in a single call. Each axis is read
+    from its source, passed through its shape (such as a `curve()`, which
+    also applies the deadband), scaled down while precision mode is on and
+    then slew rate limited, so that a flick of the stick can't step the
+    motors' output and cause a current spike or brownout. Scaling comes
+    before the rate limit so that switching precision mode is smoothed too.
+
+    All stages are created as axes are added, and `update()` writes into the
+    same `outputs` list every loop.
+    """
+
+    def __init__(
+        self, precision: Callable[[], bool] = None, precision_scale: float = 0.5
+    ):
+        """Arguments:
+        precision -- returns True while precision mode is on, eg. a button
+        precision_scale -- multiplies every axis in precision mode
+        """
+        self.precision = precision
+        self.precision_scale = precision_scale
+        self.outputs = []
+        self._axes = []
+        self._limiters = []
+
+    def add_axis(
+        self,
+        source: Callable[[], float],
+        shape: Callable[[float], float],
+        rate_limit: float = 0.0,
+        invert: bool = False,
+    ) -> "InputShaper":
+        """Add an axis, whose output will be `outputs[n]` for the nth axis
+        added. Returns the shaper, so calls can be chained.
+
+        Arguments:
+        source -- returns the axis's raw value, eg. `joystick.getY`
+        shape -- maps the raw value to an output, eg. a `curve()`
+        rate_limit -- the most the output may change per second.
+            If this is 0, no limit is applied.
+        invert -- if True, the output is negated
+        """
+        if rate_limit:
+            limiter = SlewRateLimiter(rate_limit)
+            self._limiters.append(limiter)
+            limit = limiter.calculate
+        else:
+            limit = None
+        self._axes.append((source, shape, -1.0 if invert else 1.0, limit))
+        self.outputs.append(0.0)
+        return self
+
+    def update(self) -> list[float]:
+        """Read and shape every axis, and return `outputs`"""
+        if self.precision is not None and self.precision():
+            scale = self.precision_scale
+        else:
+            scale = 1.0
+        outputs = self.outputs
+        i = 0
+        for source, shape, sign, limit in self._axes:
+            value = shape(source()) * sign * scale
+            outputs[i] = value if limit is None else limit(value)
+            i += 1
+        return outputs
+
+    def reset(self):
+        """Zero every output and rate limit, eg. when teleop starts"""
+        for limiter in self._limiters:
+            limiter.reset(0)
+        for i in range(len(self.outputs)):
+            self.outputs[i] = 0.0